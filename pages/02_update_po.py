@@ -7,8 +7,10 @@ import gc
 import logging
 from typing import List, Tuple, Optional, Dict, Any
 import numpy as np
-import base64
 import re
+import tempfile
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Desabilitar a exibição de separadores de milhar
 pd.options.display.float_format = '{:,.0f}'.format  # Para números decimais
@@ -22,7 +24,11 @@ logger = logging.getLogger(__name__)
 # Constants
 MAX_UPLOAD_SIZE_MB = 200
 BYTES_PER_MB = 1024 * 1024
-CHUNK_SIZE = 10000  # Number of rows to process at once
+EXCEL_SPOOL_MAX_SIZE = 64 * BYTES_PER_MB  # Above this the Excel output spills to disk
+MAX_READ_WORKERS = 8  # Upper bound on workbooks parsed concurrently
+READ_PROGRESS_SHARE = 0.5  # Progress bar fraction spent reading the workbooks
+PROCESS_PROGRESS_DONE = 0.8  # Progress bar value once processing is done (export fills the rest)
+DATE_FORMAT = '%d/%m/%Y'
 
 # Colunas selecionadas para salvar no arquivo final
 SELECTED_COLUMNS = [
@@ -65,53 +71,99 @@ SELECTED_COLUMNS = [
     'unique'
 ]
 
+# Colunas de texto com poucos valores distintos, armazenadas como 'category'
+CATEGORY_COLUMNS = [
+    'Order Unit',
+    'Control Code (NCM)',
+    'Project Code',
+    'Purchasing Group',
+    'Plant'
+]
+
+# Chaves de st.session_state usadas por esta página
+PO_SESSION_KEYS = (
+    'initialized',
+    'processed_data',
+    'download_filename',
+    'excel_data',
+    'download_triggered'
+)
+
+# Colunas de data formatadas como dd/mm/YYYY no arquivo final
+DATE_COLUMNS = [
+    'Document Date', 'Delivery date', 'Last FUP',
+    'Stat.-Rel. Del. Date', 'Delivery Date',
+    'Requisition Date', 'Inspection Request Date',
+    'First Delivery Date', 'Purchase Requisition Delivery Date'
+]
+
+# Valores e quantidades usados nas contas de process_chunk; ficam fora do
+# downcast para que o produto valor x quantidade não estoure em int16/int32
+NUMERIC_COLUMNS = ['Net order value', 'Order Quantity', 'PBXX Condition Amount']
+
 #Document Date
 
 class DataProcessor:
     """Class to handle all data processing operations"""    
     @staticmethod
-    def format_currency(value: float) -> str:
-        """Format value as Brazilian currency"""
-        try:
-            if pd.isna(value) or value == '':
-                return "R$ 0,00"
-            
-            if isinstance(value, str):
-                value = float(value.replace('.', '').replace(',', '.'))
-            
-            value = float(value)
-            integer_part = int(value)
-            decimal_part = int((value - integer_part) * 100)
-            
-            formatted_integer = '{:,}'.format(integer_part).replace(',', '.')
-            return f"R$ {formatted_integer},{decimal_part:02d}"
-        except Exception as e:
-            logger.warning(f"Error formatting currency value {value}: {str(e)}")
-            return "R$ 0,00"
+    def format_currency_series(series: pd.Series) -> pd.Series:
+        """Format a whole column as Brazilian currency, formatting each distinct value once"""
+        values = pd.to_numeric(series, errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+        cents = np.rint(values * 100).astype(np.int64)
+        
+        # Totais por PO se repetem em todas as linhas da PO: formata só os valores distintos
+        codes, unique_cents = pd.factorize(cents)
+        sign = np.where(unique_cents < 0, '-', '')
+        integer_part, decimal_part = np.divmod(np.abs(unique_cents), 100)
+        formatted = np.array(
+            [
+                f"R$ {s}{i:,}".replace(',', '.') + f",{d:02d}"
+                for s, i, d in zip(sign, integer_part.tolist(), decimal_part.tolist())
+            ],
+            dtype=object
+        )
+        return pd.Series(formatted[codes], index=series.index)
 
     @staticmethod
-    def safe_division(x: float, y: float) -> float:
-        """Safely perform division handling zero division"""
-        try:
-            return x / y if y != 0 else 0
-        except:
-            return 0
+    def format_dates(series: pd.Series) -> pd.Series:
+        """Format a datetime column as dd/mm/YYYY, calling strftime once per distinct date"""
+        codes, uniques = pd.factorize(series)
+        formatted = np.append(uniques.strftime(DATE_FORMAT).to_numpy(dtype=object), np.nan)
+        # NaT recebe código -1, que aponta para o NaN acrescentado no final
+        return pd.Series(formatted[codes], index=series.index)
+
+    @staticmethod
+    def optimize_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+        """Downcast integer columns and encode low-cardinality text as category"""
+        # Floats ficam em float64: valores monetários perderiam centavos em float32.
+        # Valores e quantidades inteiros também não são reduzidos (ver NUMERIC_COLUMNS)
+        for col in df.select_dtypes(include='integer').columns.difference(NUMERIC_COLUMNS):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+        for col in CATEGORY_COLUMNS:
+            if col in df.columns and df[col].dtype == object:
+                df[col] = df[col].astype('category')
+
+        return df
 
     @staticmethod
     def process_chunk(df: pd.DataFrame) -> pd.DataFrame:
         """Process a chunk of data"""
         try:
-            chunk_processed = df.copy()
+            # Cópia rasa: as colunas são substituídas inteiras (nunca escritas no lugar),
+            # então o DataFrame de entrada fica intacto sem duplicar todos os dados
+            chunk_processed = df.copy(deep=False)
             
-            numeric_columns = ['Net order value', 'Order Quantity', 'PBXX Condition Amount']
-            for col in numeric_columns:
+            for col in NUMERIC_COLUMNS:
                 if col in chunk_processed.columns:
                     chunk_processed[col] = pd.to_numeric(chunk_processed[col], errors='coerce')
                     chunk_processed[col] = chunk_processed[col].fillna(0)
             
-            chunk_processed['valor_unitario'] = chunk_processed.apply(
-                lambda row: DataProcessor.safe_division(row['Net order value'], row['Order Quantity']),
-                axis=1
+            # Divisão vetorizada; quantidade zero resulta em valor unitário 0
+            net = chunk_processed['Net order value'].to_numpy(dtype=np.float64)
+            qty = chunk_processed['Order Quantity'].to_numpy(dtype=np.float64)
+            chunk_processed['valor_unitario'] = np.divide(
+                net, qty, out=np.zeros_like(net), where=qty != 0
             )
             
             chunk_processed['valor_item_com_impostos'] = (
@@ -125,54 +177,61 @@ class DataProcessor:
             raise
                    
     @staticmethod
-    def process_dataframe(df: pd.DataFrame, progress_bar: Any) -> pd.DataFrame:
-        """Process the complete DataFrame with progress tracking"""
+    def process_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+        """Process the complete DataFrame"""
         try:
-            chunk_size = CHUNK_SIZE
-            num_chunks = len(df) // chunk_size + 1
-            processed_chunks = []
-            
-            for i in range(num_chunks):
-                start_idx = i * chunk_size
-                end_idx = min((i + 1) * chunk_size, len(df))
-                chunk = df.iloc[start_idx:end_idx]
-                
-                processed_chunk = DataProcessor.process_chunk(chunk)
-                processed_chunks.append(processed_chunk)
-                
-                progress = (i + 1) / num_chunks
-                progress_bar.progress(progress)
-                
-            df_processed = pd.concat(processed_chunks, ignore_index=True)
-            
             # Eliminar as linhas onde os valores na coluna 'coluna' são strings
-            df_processed = df_processed[~df_processed['Purchasing Document'].apply(lambda x: isinstance(x, str))]
+            # (coluna numérica não tem strings; o apply só roda em colunas object)
+            df_processed = df
+            if not pd.api.types.is_numeric_dtype(df_processed['Purchasing Document']):
+                df_processed = df_processed[~df_processed['Purchasing Document'].apply(lambda x: isinstance(x, str))]
+            
+            # Sem as strings, a PO vira chave inteira uma única vez: groupby, join,
+            # dedup e a saída usam esse int64, sem voltar a passar por string
+            # (cópia rasa para não trocar a coluna no DataFrame de quem chamou)
+            df_processed = df_processed.copy(deep=False)
+            po_numbers = pd.to_numeric(df_processed['Purchasing Document'])
+            # int64 simples quando não há PO vazia (sem a máscara do Int64); int32 não
+            # serve: os números de PO (45xxxxxxxx) passam de 2**31
+            df_processed['Purchasing Document'] = po_numbers.astype(
+                np.int64 if po_numbers.notna().all() else 'Int64'
+            )
                        
+            # Deduplica pelo par (PO, item) antes de qualquer cálculo, para que
+            # conversões, totais e formatação só vejam as linhas que ficam
+            df_processed = df_processed.drop_duplicates(subset=['Purchasing Document', 'Item'])
+            
+            # As operações de process_chunk já são vetorizadas: rodar sobre o
+            # DataFrame inteiro evita as fatias com iloc e o concat no final
+            df_processed = DataProcessor.process_chunk(df_processed)
+            
+            # A coluna 'unique' vai para o arquivo final; é gerada só para as linhas restantes
             df_processed['unique'] = (
                 df_processed['Purchasing Document'].astype(str) + 
                 df_processed['Item'].astype(str)
             )
-            
-            
-            
-            # Evitar SettingWithCopyWarning e garantir a conversão correta
-            # df_processed.loc[:, 'unique'] = df_processed['Purchasing Document'].astype(str) + df_processed['Item'].astype(str)
 
             # Garantir que a coluna 'Supplier' seja tratada como string (para evitar problemas com valores não numéricos)
             df_processed['Supplier'] = df_processed['Supplier'].astype(str)
             
-            df_processed = df_processed.drop_duplicates(subset=['unique'])
-            
-            groupby_cols = ['Purchasing Document']
-            df_processed['total_valor_po_liquido'] = df_processed.groupby(groupby_cols)['Net order value'].transform('sum')
-            df_processed['total_valor_po_com_impostos'] = df_processed.groupby(groupby_cols)['valor_item_com_impostos'].transform('sum')
-            df_processed['total_itens_po'] = df_processed.groupby(groupby_cols)['Order Quantity'].transform('sum')
-                        
-            # df_processed['Purchasing Document'] = pd.to_numeric(df_processed['Purchasing Document'], errors='coerce')
-            # df_processed = df_processed.dropna(subset=['Purchasing Document'])
-            # df_processed['Purchasing Document'] = df_processed['Purchasing Document'].astype(int)
-            
-            df_processed['PO Creation Date'] = pd.to_datetime(df_processed['Document Date'], dayfirst=True)
+            # Um único groupby calcula os três totais por PO
+            po_totals = df_processed.groupby('Purchasing Document', sort=False, observed=True).agg(
+                total_valor_po_liquido=('Net order value', 'sum'),
+                total_valor_po_com_impostos=('valor_item_com_impostos', 'sum'),
+                total_itens_po=('Order Quantity', 'sum')
+            )
+            # Um arquivo já exportado traz as colunas de total (estão em SELECTED_COLUMNS):
+            # elas são descartadas e recalculadas, como antes
+            df_processed = df_processed.drop(columns=po_totals.columns, errors='ignore').join(
+                po_totals, on='Purchasing Document'
+            )
+
+            # Formato explícito usa o parser rápido do pandas em vez da inferência por valor
+            df_processed['PO Creation Date'] = pd.to_datetime(
+                df_processed['Document Date'],
+                format=DATE_FORMAT,
+                errors='coerce'
+            )
             df_processed = df_processed.sort_values(by='PO Creation Date', ascending=False)
             
 
@@ -183,24 +242,17 @@ class DataProcessor:
             ]
             
             for col in currency_columns:
-                df_processed[f'{col}_formatted'] = df_processed[col].apply(DataProcessor.format_currency)
+                df_processed[f'{col}_formatted'] = DataProcessor.format_currency_series(df_processed[col])
             
-            date_columns = [
-                'Document Date', 'Delivery date', 'Last FUP', 
-                'Stat.-Rel. Del. Date', 'Delivery Date', 
-                'Requisition Date', 'Inspection Request Date',
-                'First Delivery Date', 'Purchase Requisition Delivery Date'
-            ]
+            # 'Document Date' já foi convertida acima; não precisa passar pelo parser de novo
+            df_processed['Document Date'] = DataProcessor.format_dates(df_processed['PO Creation Date'])
             
-            for col in date_columns:
-                if col in df_processed.columns:
-                    df_processed[col] = pd.to_datetime(
-                        df_processed[col],
-                        format='%d/%m/%Y',
-                        dayfirst=True,
-                        errors='coerce'
+            # Só as colunas de data presentes (o usecols da leitura descarta a maioria)
+            for col in df_processed.columns.intersection(DATE_COLUMNS):
+                if col != 'Document Date':
+                    df_processed[col] = DataProcessor.format_dates(
+                        pd.to_datetime(df_processed[col], format=DATE_FORMAT, errors='coerce')
                     )
-                    df_processed[col] = df_processed[col].dt.strftime('%d/%m/%Y')
                     
             @staticmethod
             def extract_code(text):
@@ -226,24 +278,16 @@ class DataProcessor:
                 
                 # Retorna apenas os 6 dígitos se encontrar
                 return match.group(1) if match else ""
-            df_processed['codigo_projeto'] = df_processed['Andritz WBS Element'].apply(extract_code)
-            df_processed['codigo_projeto'] = df_processed['codigo_projeto'].apply(
-                lambda x: int(x) if x != "" else ""
-            )     
-            
-            
-                     
-            # Lista de colunas que você quer limpar
-            columns_to_clean = [ 'Purchasing Document', 'Item', 'Material']
-
-            for col in columns_to_clean:
-                df[col] = (
-                    df[col]                          # Seleciona a coluna
-                    .astype(str)                     # Converte para string
-                    .str.replace(r'\D', '', regex=True)  # Remove caracteres não numéricos
-                    .replace('', pd.NA)             # Substitui strings vazias por NaN
-                    .astype(pd.Int64Dtype())         # Converte para Int64 (com suporte a NaN)
-                )
+            # Poucos elementos PEP distintos se repetem em muitas linhas: a regex
+            # roda uma vez por valor distinto e o resultado é espalhado pelos códigos
+            wbs_codes, wbs_uniques = pd.factorize(df_processed['Andritz WBS Element'])
+            project_codes = [extract_code(wbs) for wbs in wbs_uniques]
+            project_codes = np.array(
+                [int(code) if code != "" else "" for code in project_codes] + [""],
+                dtype=object
+            )
+            # Valores vazios recebem código -1, que aponta para o "" do final
+            df_processed['codigo_projeto'] = project_codes[wbs_codes]
             
             df_processed = df_processed[SELECTED_COLUMNS] 
                     
@@ -263,51 +307,71 @@ class FileHandler:
         return sum(file.size for file in files) / BYTES_PER_MB
 
     @staticmethod
-    def to_excel(df: pd.DataFrame) -> str:
-        """Convert DataFrame to Excel file and return as base64 string"""
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False)
-        excel_data = output.getvalue()
-        b64 = base64.b64encode(excel_data).decode()
-        return b64
+    def to_excel(df: pd.DataFrame) -> bytes:
+        """Convert DataFrame to Excel file and return its bytes"""
+        # Planilhas grandes vão para disco em vez de ficarem duplicadas na RAM.
+        # constant_memory não é usado: o pandas escreve por coluna e esse modo
+        # do xlsxwriter descarta células fora da ordem de linhas.
+        with tempfile.SpooledTemporaryFile(max_size=EXCEL_SPOOL_MAX_SIZE) as output:
+            with pd.ExcelWriter(
+                output,
+                engine='xlsxwriter',
+                engine_kwargs={'options': {'in_memory': False}}
+            ) as writer:
+                df.to_excel(writer, index=False)
+            output.seek(0)
+            return output.read()
+
+    @staticmethod
+    def read_excel_file(file_name: str, file_bytes: bytes) -> Optional[pd.DataFrame]:
+        """Safely read Excel file (cached on the file contents)"""
+        return read_excel_cached(file_bytes, file_name)
 
     @staticmethod
-    def read_excel_file(file: Any) -> Optional[pd.DataFrame]:
-        """Safely read Excel file"""
+    def file_hash(file_bytes: bytes) -> str:
+        """Fingerprint of an uploaded file, used as cache key"""
+        return hashlib.blake2b(file_bytes, digest_size=20).hexdigest()
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def read_excel_cached(file_bytes: bytes, file_name: str) -> Optional[pd.DataFrame]:
+    """Parse an uploaded workbook; reruns with the same bytes hit the cache"""
+    try:
         try:
-            return pd.read_excel(file, engine='openpyxl')
-        except Exception as e:
-            logger.error(f"Error reading file {file.name}: {str(e)}")
-            return None
+            # calamine (Rust) é bem mais rápido; sem ele, o openpyxl do pandas
+            # já abre a planilha em modo read_only
+            df = pd.read_excel(
+                io.BytesIO(file_bytes),
+                engine='calamine',
+                usecols=lambda col: col in SELECTED_COLUMNS
+            )
+        except ImportError:
+            df = pd.read_excel(
+                io.BytesIO(file_bytes),
+                engine='openpyxl',
+                usecols=lambda col: col in SELECTED_COLUMNS
+            )
+        return DataProcessor.optimize_dtypes(df)
+    except Exception as e:
+        logger.error(f"Error reading file {file_name}: {str(e)}")
+        return None
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def process_files_cached(files_key: Tuple[str, ...], _df: pd.DataFrame) -> pd.DataFrame:
+    """Process the concatenated upload; cached on the hashes of the uploaded files"""
+    return DataProcessor.process_dataframe(_df)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def export_excel_cached(files_key: Tuple[str, ...], _df: pd.DataFrame) -> bytes:
+    """Serialize the processed upload once per set of files (xlsx bytes)"""
+    return FileHandler.to_excel(_df)
 
 def clear_session_state():
-    """Clear all session state variables"""
-    for key in list(st.session_state.keys()):
-        del st.session_state[key]
+    """Clear this page's session state variables"""
+    # Só as chaves desta página: login e estado das outras páginas ficam intactos
+    for key in PO_SESSION_KEYS:
+        st.session_state.pop(key, None)
     gc.collect()
 
-def get_download_link(b64_data: str, filename: str) -> str:
-    """Generate HTML download link for Excel file with callback"""
-    href = f'data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64_data}'
-    return f'''
-        <a href="{href}" 
-           download="{filename}" 
-           class="downloadButton"
-           onclick="setTimeout(function(){{ window.location.href = window.location.pathname; }}, 1000);">
-           📥 Baixar Arquivo Excel Processado
-        </a>
-        <script>
-            window.addEventListener('load', function() {{
-                document.querySelector('.downloadButton').addEventListener('click', function() {{
-                    setTimeout(function() {{
-                        window.location.reload();
-                    }}, 1000);
-                }});
-            }});
-        </script>
-    '''
-
 def main():
     """Main application function"""
     st.set_page_config(
@@ -387,30 +451,48 @@ def main():
                         status_placeholder = st.empty()
                         
                         start_time = time.time()
-                        all_dfs = []
+                        # Os bytes de cada arquivo são obtidos uma vez e reaproveitados no hash e na leitura
+                        blobs = [(f.name, f.getvalue()) for f in uploaded_files]
+                        files_key = tuple(FileHandler.file_hash(data) for _, data in blobs)
                         
-                        for idx, uploaded_file in enumerate(uploaded_files):
-                            status_placeholder.info(f"Processando: {uploaded_file.name}")
-                            df_temp = FileHandler.read_excel_file(uploaded_file)
-                            
-                            if df_temp is not None and not df_temp.empty:
-                                all_dfs.append(df_temp)
-                            
-                            progress_bar.progress((idx + 1) / len(uploaded_files))
+                        # Cada planilha é lida numa thread; os resultados ficam na ordem
+                        # do upload para o drop_duplicates manter a mesma linha de antes.
+                        # A leitura ocupa a primeira metade da barra; processamento e
+                        # exportação (em cache) avançam o restante ao terminar
+                        results: List[Optional[pd.DataFrame]] = [None] * len(uploaded_files)
+                        status_placeholder.info(f"Lendo {len(uploaded_files)} arquivo(s)...")
+                        with ThreadPoolExecutor(max_workers=min(MAX_READ_WORKERS, len(uploaded_files))) as executor:
+                            futures = {
+                                executor.submit(FileHandler.read_excel_file, name, data): idx
+                                for idx, (name, data) in enumerate(blobs)
+                            }
+                            for done, future in enumerate(as_completed(futures)):
+                                idx = futures[future]
+                                results[idx] = future.result()
+                                status_placeholder.info(f"Processado: {blobs[idx][0]}")
+                                progress_bar.progress(READ_PROGRESS_SHARE * (done + 1) / len(uploaded_files))
+                        
+                        all_dfs = [df_temp for df_temp in results if df_temp is not None and not df_temp.empty]
                         
                         if all_dfs:
-                            df_final = pd.concat(all_dfs, ignore_index=True)
+                            # O concat volta para object as categorias que diferem entre arquivos
+                            df_final = DataProcessor.optimize_dtypes(pd.concat(all_dfs, ignore_index=True))
                             
                             df = df_final 
                             
-                            df_processed = DataProcessor.process_dataframe(df_final, progress_bar)
+                            status_placeholder.info("Processando dados...")
+                            df_processed = process_files_cached(files_key, df_final)
+                            progress_bar.progress(PROCESS_PROGRESS_DONE)
                             
                             st.session_state.processed_data = df_processed
                             
                             st.session_state.download_filename = f"PO_{randon}.xlsx"
                             
-                            # Convert to base64 and store in session state
-                            st.session_state.excel_data = FileHandler.to_excel(df_processed)
+                            # Gera o xlsx e guarda os bytes na sessão
+                            status_placeholder.info("Gerando arquivo Excel...")
+                            st.session_state.excel_data = export_excel_cached(files_key, df_processed)
+                            progress_bar.progress(1.0)
+                            status_placeholder.empty()
                             
                             elapsed_time = time.time() - start_time
                             
@@ -431,11 +513,14 @@ def main():
         
         if st.session_state.excel_data is not None:
             st.subheader("📥 Download do Arquivo Processado")
-            download_link = get_download_link(
-                st.session_state.excel_data,
-                st.session_state.download_filename
+            # Os bytes vão direto para o download, sem base64 embutido no HTML da página
+            st.download_button(
+                label="📥 Baixar Arquivo Excel Processado",
+                data=st.session_state.excel_data,
+                file_name=st.session_state.download_filename,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                use_container_width=True
             )
-            st.markdown(download_link, unsafe_allow_html=True)
 
             # Add a button to manually clear the cache and return to initial state
             if st.button("🔄 Limpar e Voltar ao Início", use_container_width=True):
@@ -474,10 +559,7 @@ def main():
             #     df['Purchasing Document'].astype(str) + 
             #     df['Item'].astype(str)
             # )
-                        # Evitar SettingWithCopyWarning e garantir a conversão correta
-            # Crie uma cópia explícita do DataFrame se necessário
-            df = df.copy() 
-                       
+            # A seleção de colunas acima já devolve um DataFrame novo; não precisa de .copy()
             df.loc[:, 'unique'] = df['Purchasing Document'].astype(str) + df['Item'].astype(str)
 
             # Garantir que a coluna 'Supplier' seja tratada como string (para evitar problemas com valores não numéricos)
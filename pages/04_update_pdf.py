@@ -4,7 +4,6 @@ import pdfplumber
 import re
 import os
 from datetime import datetime
-import base64
 from io import BytesIO
 import tempfile
 import unicodedata
@@ -369,13 +368,11 @@ def extrair_dados_nf(pdf_file):
     return dados_nf
 
 def to_excel(df):
-    """Convert dataframe to excel file and encode it for download"""
+    """Convert dataframe to excel file bytes for download"""
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         df.to_excel(writer, index=False)
-    excel_data = output.getvalue()
-    b64 = base64.b64encode(excel_data).decode('utf-8')
-    return b64
+    return output.getvalue()
 #dados_extraidos
 
 def main():
@@ -445,7 +442,7 @@ def main():
                 excel_file = to_excel(df_nf)
                 st.download_button(
                     label="📥 Baixar Excel",
-                    data=base64.b64decode(excel_file),
+                    data=excel_file,
                     file_name=f'nfspdf_{randon}.xlsx',
                     mime="application/vnd.ms-excel"
                 )
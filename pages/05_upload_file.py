@@ -1,13 +1,20 @@
 import streamlit as st
 import pandas as pd
-from pymongo import MongoClient, errors
+from pymongo import MongoClient, InsertOne, errors
+from pymongo.write_concern import WriteConcern
 import urllib.parse
 import numpy as np
 from datetime import datetime, time, timezone
 import time as time_module
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
 import itertools
 import dns.resolver
+import pyarrow as pa
+import bson
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from utils.excel import load_excel
 dns.resolver.default_resolver = dns.resolver.Resolver(configure=False)
 dns.resolver.default_resolver.nameservers = ['8.8.8.8', '8.8.4.4'] 
 
@@ -70,60 +77,126 @@ MAX_RETRIES = 5
 RETRY_DELAY = 3
 CONNECTION_TIMEOUT = 30000    # 30 segundos
 SOCKET_TIMEOUT = 45000       # 45 segundos
+MAX_POOL_SIZE = 64
+MIN_POOL_SIZE = 8
+UPLOAD_WORKERS = 16          # Lotes inseridos em paralelo
+MIN_BATCH_SIZE = 200
+MAX_BATCH_SIZE = 2000
+MAX_BATCH_BYTES = 15 * 1024 * 1024  # Abaixo do limite de 16MB por mensagem BSON
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'  # Formato das datas gravadas, inclusive creation_date
+DUPLICATE_KEY_ERROR = 11000
+CURSOR_BATCH_SIZE = 5000     # Documentos por ida ao servidor na leitura das chaves
+DEDUP_MAX_GROUP_IDS = 1000   # _id guardados por grupo na agregação da limpeza rápida
+ARROW_CHUNK_ROWS = 50000     # Linhas convertidas por vez para dicts via pyarrow
 
-@contextmanager
-def mongodb_connection():
-    """Context manager para conexão MongoDB com retry e timeouts"""
-    client = None
+# Tipos inferidos de colunas 'object' que são convertidos em bloco, e o dtype
+# intermediário usado (None: o BSON já aceita os valores, só os nulos viram None)
+VECTORIZED_OBJECT_DTYPES = {
+    'string': None,
+    'empty': None,
+    'integer': 'Int64',
+    'floating': 'float64',
+    'mixed-integer-float': 'float64'
+}
+
+@st.cache_resource
+def get_mongodb_client():
+    """Cliente MongoDB único, reaproveitado entre reruns com o pool de conexões aquecido"""
+    connection_string = (
+        f"mongodb+srv://{USERNAME}:{PASSWORD}@{CLUSTER}/"
+        f"?retryWrites=true&w=majority"
+        f"&connectTimeoutMS={CONNECTION_TIMEOUT}"
+        f"&socketTimeoutMS={SOCKET_TIMEOUT}"
+        f"&serverSelectionTimeoutMS={CONNECTION_TIMEOUT}"
+    )
+    
+    client = MongoClient(
+        connection_string,
+        connect=True,
+        serverSelectionTimeoutMS=CONNECTION_TIMEOUT,
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE
+    )
+    
+    # O ping com retry só acontece na criação; falhas não ficam em cache
     for attempt in range(MAX_RETRIES):
         try:
-            connection_string = (
-                f"mongodb+srv://{USERNAME}:{PASSWORD}@{CLUSTER}/"
-                f"?retryWrites=true&w=majority"
-                f"&connectTimeoutMS={CONNECTION_TIMEOUT}"
-                f"&socketTimeoutMS={SOCKET_TIMEOUT}"
-                f"&serverSelectionTimeoutMS={CONNECTION_TIMEOUT}"
-            )
-            
-            client = MongoClient(
-                connection_string,
-                connect=True,
-                serverSelectionTimeoutMS=CONNECTION_TIMEOUT
-            )
-            
             client.admin.command('ping')
-            db = client[DB_NAME]
-            yield db
-            break
+            return client
             
         except errors.ServerSelectionTimeoutError:
             if attempt == MAX_RETRIES - 1:
+                client.close()
                 raise Exception("Erro de conexão: Não foi possível conectar ao MongoDB após várias tentativas")
             time_module.sleep(RETRY_DELAY)
             
         except errors.OperationFailure as e:
+            client.close()
             raise Exception(f"Erro de autenticação: {str(e)}")
-            
-        except Exception as e:
-            raise Exception(f"Erro inesperado: {str(e)}")
-            
-        finally:
-            if client:
-                client.close()
+
+@contextmanager
+def mongodb_connection():
+    """Context manager que entrega o banco usando o cliente compartilhado"""
+    yield get_mongodb_client()[DB_NAME]
 
 def handle_date(value):
-    """Função para tratar datas e horários."""
+    """Função para tratar datas e horários isolados (colunas datetime64 são convertidas em bloco)."""
     if pd.isna(value) or pd.isnull(value):
         return None
-    if isinstance(value, pd.Timestamp):
-        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, datetime):
+        return value.strftime(DATETIME_FORMAT)
     if isinstance(value, time):
         return value.strftime('%H:%M:%S')
     return value
 
+def convert_value(x):
+    """Converte um valor isolado para um tipo aceito pelo MongoDB."""
+    if pd.isna(x):
+        return None
+    if isinstance(x, (np.integer, int)):
+        return int(x)
+    if isinstance(x, (np.floating, float)):
+        return float(x)
+    if isinstance(x, (np.bool_, bool)):
+        return bool(x)
+    if isinstance(x, (time, datetime)):
+        return handle_date(x)
+    if isinstance(x, np.datetime64):
+        return str(x)
+    return x
+
+def nan_to_none(series):
+    """Converte uma coluna numérica em objetos Python nativos, com None no lugar de NaN"""
+    if not isinstance(series.dtype, np.dtype):
+        # Dtypes de extensão (Int64, boolean) já tratam pd.NA na conversão
+        return series.to_numpy(dtype=object, na_value=None)
+    values = series.to_numpy()
+    mask = np.isnan(values) if values.dtype.kind == 'f' else None
+    # astype(object) devolve int/float/bool nativos do Python
+    converted = values.astype(object)
+    if mask is not None:
+        converted[mask] = None
+    return converted
+
+def convert_object_column(series):
+    """Converte em bloco colunas 'object' homogêneas (texto ou números); retorna None se não for o caso"""
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred not in VECTORIZED_OBJECT_DTYPES:
+        return None
+    target_dtype = VECTORIZED_OBJECT_DTYPES[inferred]
+    try:
+        if target_dtype is not None:
+            series = series.astype(target_dtype)
+        return series.to_numpy(dtype=object, na_value=None)
+    except (OverflowError, TypeError, ValueError):
+        return None
+
 def clean_dataframe(df):
-    """Limpa e prepara o DataFrame para inserção no MongoDB."""
-    df_clean = df.copy()
+    """Limpa e prepara o DataFrame para inserção no MongoDB.
+    
+    O DataFrame recebido é alterado no próprio lugar para não duplicar a memória.
+    """
+    df_clean = df
     
     # Remove '_id' e 'creation_date' se existirem para evitar conflitos
     columns_to_drop = []
@@ -133,67 +206,146 @@ def clean_dataframe(df):
         columns_to_drop.append('creation_date')
     
     if columns_to_drop:
-        df_clean = df_clean.drop(columns=columns_to_drop)
+        df_clean.drop(columns=columns_to_drop, inplace=True)
     
     # Adiciona 'creation_date' automaticamente com o timestamp UTC e timezone-aware
     df_clean['creation_date'] = datetime.now(timezone.utc)
     
-    for column in df_clean.columns:
-        if pd.api.types.is_datetime64_any_dtype(df_clean[column]):
-            df_clean[column] = df_clean[column].apply(handle_date)
+    # O tipo é decidido uma vez por coluna; só colunas 'object' caem no loop por célula
+    for column, dtype in zip(df_clean.columns, df_clean.dtypes):
+        series = df_clean[column]
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            df_clean[column] = series.dt.strftime(DATETIME_FORMAT).where(series.notna(), None)
+        elif dtype.kind in 'iufb':
+            df_clean[column] = nan_to_none(series)
         else:
-            df_clean[column] = df_clean[column].apply(lambda x: 
-                None if pd.isna(x) 
-                else int(x) if isinstance(x, (np.integer, int))
-                else float(x) if isinstance(x, (np.floating, float))
-                else bool(x) if isinstance(x, (np.bool_, bool))
-                else x.strftime('%H:%M:%S') if isinstance(x, time)
-                else str(x) if isinstance(x, (np.datetime64, datetime))
-                else x
-            )
+            converted = convert_object_column(series) if dtype == object else None
+            if converted is None:
+                converted = series.apply(convert_value)
+            df_clean[column] = converted
     
     return df_clean
 
-def upload_to_mongodb(df, collection_name):
-    """Upload do DataFrame para MongoDB com melhor gestão de erros"""
+def insert_batch(collection, batch):
+    """Insere um lote de documentos, repetindo em caso de falha de rede.
+    
+    Retorna (inseridos, duplicados ignorados); violações de índice único não
+    interrompem o lote porque a inserção é não ordenada.
+    """
+    retry_count = 0
+    while True:
+        try:
+            result = collection.bulk_write(
+                [InsertOne(doc) for doc in batch],
+                ordered=False
+            )
+            # Com w=0 o servidor não devolve contagem; considera o lote enviado
+            inserted = result.inserted_count if result.acknowledged else len(batch)
+            return inserted, 0
+        except errors.BulkWriteError as bwe:
+            write_errors = bwe.details.get('writeErrors', [])
+            skipped = sum(1 for e in write_errors if e.get('code') == DUPLICATE_KEY_ERROR)
+            if skipped != len(write_errors) or bwe.details.get('writeConcernErrors'):
+                raise
+            return bwe.details.get('nInserted', 0), skipped
+        except (errors.AutoReconnect, errors.NetworkTimeout):
+            retry_count += 1
+            if retry_count == MAX_RETRIES:
+                raise
+            time_module.sleep(RETRY_DELAY)
+
+def iter_rows(df):
+    """Gera as linhas do DataFrame como dicts, em blocos convertidos pelo pyarrow"""
+    columns = list(df.columns)
+    for start in range(0, len(df), ARROW_CHUNK_ROWS):
+        chunk = df.iloc[start:start + ARROW_CHUNK_ROWS]
+        try:
+            yield from pa.RecordBatch.from_pandas(chunk, preserve_index=False).to_pylist()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # Colunas com tipos misturados não viram Arrow; segue linha a linha
+            yield from (dict(zip(columns, row)) for row in chunk.itertuples(index=False, name=None))
+
+def estimate_batch_size(sample_doc):
+    """Calcula o tamanho do lote a partir do tamanho BSON de um documento de amostra"""
+    doc_size = max(len(sample_doc.raw), 1)
+    return min(MAX_BATCH_SIZE, max(MIN_BATCH_SIZE, MAX_BATCH_BYTES // doc_size))
+
+def upload_to_mongodb(df, collection_name, fast_upload=False):
+    """Upload do DataFrame para MongoDB com melhor gestão de erros.
+    
+    Com fast_upload=True as escritas não são confirmadas pelo servidor (w=0);
+    o total devolvido é o de documentos enviados, não o de inseridos.
+    """
     try:
         with mongodb_connection() as db:
             df_clean = clean_dataframe(df)
-            records = df_clean.to_dict('records')
+            # Gera os documentos sob demanda, sem materializar a lista inteira.
+            # Cada um é codificado em BSON uma única vez, com _id fixo, e as
+            # novas tentativas reenviam os mesmos bytes.
+            records = (
+                RawBSONDocument(bson.encode({'_id': ObjectId(), **row}))
+                for row in iter_rows(df_clean)
+            )
             collection = db[collection_name]
+            write_collection = collection
+            if fast_upload:
+                write_collection = collection.with_options(write_concern=WriteConcern(w=0))
             
-            batch_size = 500
             inserted_count = 0
-            
-            for i in range(0, len(records), batch_size):
-                batch = records[i:i + batch_size]
-                retry_count = 0
-                
-                while retry_count < MAX_RETRIES:
-                    try:
-                        result = collection.insert_many(batch, ordered=False)
-                        inserted_count += len(result.inserted_ids)
+            skipped_count = 0
+            first_record = next(records, None)
+            if first_record is None:
+                return True, inserted_count, skipped_count
+            records = itertools.chain([first_record], records)
+            batch_size = estimate_batch_size(first_record)
+            st.write(f"Tamanho do lote: {batch_size} documentos")
+            
+            # Vários lotes em voo ao mesmo tempo; o limite de pendentes mantém a memória estável
+            with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+                pending = set()
+                while True:
+                    batch = list(itertools.islice(records, batch_size))
+                    if not batch:
                         break
-                    except errors.BulkWriteError as bwe:
-                        if hasattr(bwe, 'details'):
-                            inserted_count += bwe.details.get('nInserted', 0)
-                        raise
-                    except (errors.AutoReconnect, errors.NetworkTimeout):
-                        retry_count += 1
-                        if retry_count == MAX_RETRIES:
-                            raise
-                        time_module.sleep(RETRY_DELAY)
-            
-            return True, inserted_count
+                    pending.add(executor.submit(insert_batch, write_collection, batch))
+                    
+                    if len(pending) >= UPLOAD_WORKERS * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            inserted, skipped = future.result()
+                            inserted_count += inserted
+                            skipped_count += skipped
+                
+                for future in as_completed(pending):
+                    inserted, skipped = future.result()
+                    inserted_count += inserted
+                    skipped_count += skipped
+            
+            return True, inserted_count, skipped_count
             
     except errors.BulkWriteError as bwe:
-        return False, f"Erro no upload em lote (alguns documentos podem ter sido inseridos): {str(bwe)}"
+        return False, f"Erro no upload em lote (alguns documentos podem ter sido inseridos): {str(bwe)}", 0
     except errors.ServerSelectionTimeoutError:
-        return False, "Timeout na conexão com MongoDB. Verifique sua conexão e tente novamente."
+        return False, "Timeout na conexão com MongoDB. Verifique sua conexão e tente novamente.", 0
     except errors.OperationFailure as e:
-        return False, f"Erro de operação MongoDB: {str(e)}"
+        return False, f"Erro de operação MongoDB: {str(e)}", 0
     except Exception as e:
-        return False, f"Erro inesperado: {str(e)}"
+        return False, f"Erro inesperado: {str(e)}", 0
+
+def create_unique_index(collection_name, field_name):
+    """Cria um índice único parcial no campo para barrar duplicadas na inserção"""
+    try:
+        with mongodb_connection() as db:
+            collection = db[collection_name]
+            collection.create_index(
+                [(field_name, 1)],
+                unique=True,
+                partialFilterExpression={field_name: {"$exists": True}},
+                background=True
+            )
+            return True, f"Campo '{field_name}' agora é único na coleção"
+    except Exception as e:
+        return False, str(e)
 
 def get_collection_fields(collection_name):
     """Retorna os campos disponíveis em uma collection"""
@@ -208,19 +360,30 @@ def get_collection_fields(collection_name):
         st.error(f"Erro ao obter campos: {str(e)}")
         return []
 
+def ensure_dedup_index(collection, field_name):
+    """Garante o índice (campo, creation_date) usado na limpeza e devolve sua especificação"""
+    # Nome padrão do índice: um nome próprio conflitaria com índices já criados
+    # com a mesma chave. Em background não bloqueia a coleção se ainda não existir.
+    dedup_index = [(field_name, 1), ('creation_date', 1)]
+    collection.create_index(dedup_index, background=True)
+    return dedup_index
+
 def fast_remove_duplicates(collection_name, field_name):
     """Remove duplicadas mantendo os registros mais antigos com melhor gestão de timeouts"""
     try:
         with mongodb_connection() as db:
             collection = db[collection_name]
             
-            # Criar índice para melhorar performance
-            collection.create_index([(field_name, 1), ('creation_date', 1)])
+            # Índice composto que cobre o $sort abaixo
+            dedup_index = ensure_dedup_index(collection, field_name)
             
-            # Pipeline de agregação com timeout aumentado
+            # Pipeline de agregação com timeout aumentado. O $sort abre o pipeline
+            # para ser atendido pelo índice; o servidor já lê só os campos usados
+            # nas etapas seguintes, sem precisar de um $project antes
             pipeline = [
                 {
                     "$sort": {
+                        field_name: 1,
                         "creation_date": 1
                     }
                 },
@@ -228,7 +391,10 @@ def fast_remove_duplicates(collection_name, field_name):
                     "$group": {
                         "_id": f"${field_name}",
                         "original_id": {"$first": "$_id"},
-                        "count": {"$sum": 1}
+                        "count": {"$sum": 1},
+                        # Limitado para o grupo caber num documento BSON mesmo quando
+                        # muitos registros não têm o campo (todos caem no grupo null)
+                        "dupes": {"$firstN": {"input": "$_id", "n": DEDUP_MAX_GROUP_IDS}}
                     }
                 },
                 {
@@ -238,12 +404,16 @@ def fast_remove_duplicates(collection_name, field_name):
                 }
             ]
             
+            def run_pipeline():
+                return collection.aggregate(
+                    pipeline,
+                    allowDiskUse=True,
+                    hint=dedup_index,
+                    maxTimeMS=30000  # 30 segundos timeout
+                )
+            
             # Usar cursor para processar em lotes
-            duplicates_cursor = collection.aggregate(
-                pipeline,
-                allowDiskUse=True,
-                maxTimeMS=30000  # 30 segundos timeout
-            )
+            duplicates_cursor = run_pipeline()
             
             total_deleted = 0
             batch_size = 100
@@ -253,28 +423,36 @@ def fast_remove_duplicates(collection_name, field_name):
                     batch_duplicates = list(itertools.islice(duplicates_cursor, batch_size))
                     if not batch_duplicates:
                         break
-                        
-                    original_ids = [doc["original_id"] for doc in batch_duplicates]
-                    field_values = [doc["_id"] for doc in batch_duplicates]
+                    
+                    # Grupos dentro do limite trazem todos os _id e são apagados juntos
+                    ids_to_delete = [
+                        dupe_id
+                        for doc in batch_duplicates if doc["count"] <= DEDUP_MAX_GROUP_IDS
+                        for dupe_id in doc["dupes"]
+                        if dupe_id != doc["original_id"]
+                    ]
                     
                     # Deletar duplicadas em lotes
-                    result = collection.delete_many({
-                        field_name: {"$in": field_values},
-                        "_id": {"$nin": original_ids}
-                    })
+                    if ids_to_delete:
+                        result = collection.delete_many({"_id": {"$in": ids_to_delete}})
+                        total_deleted += result.deleted_count
                     
-                    total_deleted += result.deleted_count
+                    # Grupos maiores que o limite são apagados pelo valor do campo,
+                    # mantendo o registro original
+                    for doc in batch_duplicates:
+                        if doc["count"] > DEDUP_MAX_GROUP_IDS:
+                            result = collection.delete_many({
+                                field_name: doc["_id"],
+                                "_id": {"$ne": doc["original_id"]}
+                            })
+                            total_deleted += result.deleted_count
                     
                 except errors.ExecutionTimeout:
                     continue  # Continua com o próximo lote em caso de timeout
                     
                 except errors.CursorNotFound:
                     # Recria o cursor se ele expirar
-                    duplicates_cursor = collection.aggregate(
-                        pipeline,
-                        allowDiskUse=True,
-                        maxTimeMS=30000
-                    )
+                    duplicates_cursor = run_pipeline()
                     continue
             
             return True, total_deleted, collection.count_documents({})
@@ -282,54 +460,64 @@ def fast_remove_duplicates(collection_name, field_name):
     except Exception as e:
         return False, str(e), 0
 
-def batch_remove_duplicates(collection_name, field_name, batch_size=100):
+def batch_remove_duplicates(collection_name, field_name, batch_size=1000):
     """Remove duplicadas em lotes com melhor gestão de memória e timeouts"""
     try:
         with mongodb_connection() as db:
             collection = db[collection_name]
             
-            # Criar índice para melhorar performance
-            collection.create_index([(field_name, 1), ('creation_date', 1)])
+            dedup_index = ensure_dedup_index(collection, field_name)
             
             duplicates_removed = 0
-            processed_values = set()
+            ids_to_delete = []
             
-            # Processa em lotes menores com cursor
-            cursor = collection.find(
-                {},
-                {field_name: 1, '_id': 1, 'creation_date': 1}
-            ).sort('creation_date', 1).batch_size(batch_size)
+            def find_keys():
+                # Traz apenas a chave e a data, na ordem do índice: duplicadas
+                # ficam adjacentes e a primeira de cada grupo é a mais antiga
+                return collection.find(
+                    {},
+                    {field_name: 1, 'creation_date': 1}
+                ).hint(dedup_index).sort(dedup_index).batch_size(CURSOR_BATCH_SIZE)
+            
+            def flush():
+                result = collection.delete_many({'_id': {'$in': ids_to_delete}})
+                ids_to_delete.clear()
+                return result.deleted_count
+            
+            cursor = find_keys()
+            has_previous = False
+            previous_value = None
             
             while True:
                 try:
-                    batch = list(itertools.islice(cursor, batch_size))
-                    if not batch:
+                    doc = next(cursor, None)
+                    if doc is None:
                         break
-                        
-                    batch_ids_to_delete = []
-                    for doc in batch:
-                        value = doc.get(field_name)
-                        if value is not None:
-                            if value in processed_values:
-                                batch_ids_to_delete.append(doc['_id'])
-                            else:
-                                processed_values.add(value)
                     
-                    if batch_ids_to_delete:
-                        result = collection.delete_many({'_id': {'$in': batch_ids_to_delete}})
-                        duplicates_removed += result.deleted_count
+                    value = doc.get(field_name)
+                    if value is None:
+                        continue
+                    
+                    if has_previous and value == previous_value:
+                        ids_to_delete.append(doc['_id'])
+                        if len(ids_to_delete) >= batch_size:
+                            duplicates_removed += flush()
+                    else:
+                        has_previous = True
+                        previous_value = value
                     
                 except errors.CursorNotFound:
-                    # Recria o cursor se ele expirar
-                    cursor = collection.find(
-                        {},
-                        {field_name: 1, '_id': 1, 'creation_date': 1}
-                    ).sort('creation_date', 1).batch_size(batch_size)
+                    # Recria o cursor se ele expirar; o original de cada grupo continua sendo o primeiro
+                    cursor = find_keys()
+                    has_previous = False
                     continue
                     
                 except errors.ExecutionTimeout:
                     continue  # Continua com o próximo lote em caso de timeout
             
+            if ids_to_delete:
+                duplicates_removed += flush()
+            
             return True, duplicates_removed, collection.count_documents({})
                 
     except Exception as e:
@@ -363,7 +551,7 @@ def main():
 
             if uploaded_file is not None:
                 try:
-                    df = pd.read_excel(uploaded_file)
+                    df = load_excel(uploaded_file.getvalue())
                     
                     if not df.empty:
                         with st.expander("📊 Visualização dos Dados", expanded=False):
@@ -385,14 +573,19 @@ def main():
                             st.dataframe(df_types, use_container_width=True)
                         
                         if collection_name:
+                            fast_upload = st.checkbox(
+                                "Upload rápido (sem confirmação)",
+                                help="Envia sem aguardar a confirmação do servidor. Mais rápido, mas falhas de escrita não são reportadas"
+                            )
                             if st.button("📤 Enviar para MongoDB", type="primary", use_container_width=True):
                                 with st.spinner("Processando upload..."):
-                                    success, result = upload_to_mongodb(df, collection_name)
+                                    success, result, skipped = upload_to_mongodb(df, collection_name, fast_upload)
                                     if success:
                                         message_container.success(f"""
                                             ✅ Upload Concluído com Sucesso!
                                             • Coleção: {collection_name}
-                                            • Registros Inseridos: {result}
+                                            • {'Registros Enviados (sem confirmação)' if fast_upload else 'Registros Inseridos'}: {result}
+                                            • Duplicados Ignorados: {skipped}
                                         """)
                                     else:
                                         message_container.error(result)
@@ -449,6 +642,16 @@ def main():
                                 """)
                             else:
                                 st.error(f"Erro ao remover duplicadas: {removed_count}")
+                    
+                    st.markdown("---")
+                    st.info("🔒 Com o campo único, novos uploads ignoram automaticamente registros duplicados. Remova as duplicadas existentes antes.")
+                    if st.button("🔒 Tornar campo único", use_container_width=True):
+                        with st.spinner("Criando índice único..."):
+                            success, message = create_unique_index(clean_collection, selected_field)
+                            if success:
+                                st.success(f"✅ {message}")
+                            else:
+                                st.error(f"Erro ao criar índice único: {message}")
                 else:
                     st.warning("⚠️ Nenhum campo encontrado na coleção ou coleção vazia!")
             else:
@@ -1,34 +1,25 @@
 import streamlit as st
 import fitz  # PyMuPDF
 import os
-from PIL import Image
 from datetime import datetime
 from streamlit_drawable_canvas import st_canvas
+from utils.pdf import open_pdf_document, render_pdf_page
 
 # Carregar a fonte personalizada
 FONT_PATH = "https://fonts.google.com/share?selection.family=Lavishly+Yours.ttf"  # Altere para o caminho da sua fonte .ttf
 
+# Prefixo das chaves desta página em st.session_state
+PDF_STATE_PREFIX = "assinar_pdf"
+
 # Função para exibir o PDF e selecionar a página e posição da assinatura
-def display_pdf_with_selection(file_path):
-    pdf_document = fitz.open(file_path)
+def display_pdf_with_selection(pdf_bytes):
+    pdf_document, pdf_hash = open_pdf_document(pdf_bytes, PDF_STATE_PREFIX)
     num_pages = pdf_document.page_count
-    images = []
-
-    # Gerar imagens das páginas para seleção e capturar dimensões
-    page_dimensions = []
-    for page_num in range(num_pages):
-        page = pdf_document.load_page(page_num)
-        pixmap = page.get_pixmap()
-        pil_image = Image.frombytes("RGB", [pixmap.width, pixmap.height], pixmap.samples)  # Converte para PIL
-        images.append(pil_image)
-        page_dimensions.append((pixmap.width, pixmap.height))  # Armazena as dimensões da página
-
-    pdf_document.close()
     
     # Selecionar a página onde o usuário quer adicionar a assinatura
     selected_page_index = st.selectbox("Selecione a página para adicionar a assinatura", range(num_pages), format_func=lambda x: f"Página {x + 1}")
-    selected_image = images[selected_page_index]
-    width, height = page_dimensions[selected_page_index]  # Obter dimensões da página selecionada
+    selected_image = render_pdf_page(pdf_hash, selected_page_index, pdf_document)
+    width, height = selected_image.size  # Obter dimensões da página selecionada
 
     # Exibir a página e obter a posição da assinatura com o canvas interativo
     st.image(selected_image, caption=f"Página {selected_page_index + 1}")
@@ -86,7 +77,7 @@ if uploaded_file is not None:
     with open(pdf_path, "wb") as f:
         f.write(uploaded_file.getbuffer())
 
-    page_num, x, y = display_pdf_with_selection(pdf_path)
+    page_num, x, y = display_pdf_with_selection(uploaded_file.getvalue())
 
     # Upload da imagem de assinatura
     signature_file = st.file_uploader("Carregue sua assinatura digital (imagem PNG ou JPEG)", type=["png", "jpg", "jpeg"])
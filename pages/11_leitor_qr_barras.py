@@ -1,12 +1,19 @@
 import streamlit as st
+import io
 from PIL import Image
 import numpy as np
 import cv2
-from pyzbar.pyzbar import decode
+from pyzbar.pyzbar import decode, ZBarSymbol
 
-def read_codes(img):
+MAX_DECODE_SIDE = 1600  # Lado maior (px) usado na primeira tentativa de leitura
+# Simbologias oferecidas na tela; o zbar só roda os leitores das selecionadas
+SIMBOLOGIAS = ['QRCODE', 'EAN13', 'EAN8', 'UPCA', 'UPCE', 'CODE128', 'CODE39', 'CODE93', 'I25', 'CODABAR']
+SIMBOLOGIAS_PADRAO = ['QRCODE', 'EAN13', 'CODE128']
+
+def read_codes(img, symbols=None):
     try:
-        codes = decode(img)
+        # Sem simbologias selecionadas, o zbar procura todas
+        codes = decode(img, symbols=[ZBarSymbol[name] for name in symbols] if symbols else None)
         results = []
         for code in codes:
             results.append({
@@ -19,20 +26,52 @@ def read_codes(img):
         st.error(f"Erro na leitura: {e}")
         return []
 
+# A câmera e o upload disparam reruns a cada interação; o cache pelo conteúdo
+# da imagem evita decodificar de novo a mesma foto
+@st.cache_data(show_spinner=False, max_entries=8)
+def decode_image_bytes(img_bytes, symbols=None):
+    # O zbar trabalha em tons de cinza: o PIL converte direto de RGB (ou RGBA,
+    # paleta...) para um canal, sem passar por uma cópia BGR
+    gray = np.asarray(Image.open(io.BytesIO(img_bytes)).convert('L'))
+    
+    # Fotos de celular (12MP) são lidas primeiro reduzidas: o zbar acha os códigos
+    # bem com ~1600 px e trabalha sobre bem menos pixels
+    height, width = gray.shape
+    scale = MAX_DECODE_SIDE / max(height, width)
+    if scale < 1:
+        small = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        results = read_codes(small, symbols)
+        if results:
+            # Polígonos voltam para as coordenadas da imagem original
+            for result in results:
+                result['points'] = [(round(x / scale), round(y / scale)) for x, y in result['points']]
+            return results
+    
+    # Imagem pequena, ou nada encontrado na versão reduzida: lê em resolução total
+    return read_codes(gray, symbols)
+
 def mark_image(img, results):
     output = img.copy()
-    for result in results:
-        pts = np.array(result['points']).reshape((-1, 1, 2))
-        cv2.polylines(output, [pts], True, (0, 255, 0), 2)
+    # Todos os contornos num único polylines; só o texto precisa de uma chamada por código
+    all_pts = [np.asarray(result['points'], dtype=np.int32).reshape((-1, 1, 2)) for result in results]
+    cv2.polylines(output, all_pts, True, (0, 255, 0), 2)
+    for result, pts in zip(results, all_pts):
         x, y = pts[0][0]
-        cv2.putText(output, result['type'], (x, y-10),
+        cv2.putText(output, result['type'], (int(x), int(y) - 10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
     return output
 
-def main():
-    st.title("Leitor QR Code/Código de Barras")
-    
+# Fragmento: trocar a fonte, capturar ou enviar uma imagem reexecuta só o leitor,
+# não o script inteiro da página
+@st.fragment
+def barcode_reader():
     source = st.radio("Selecione a fonte:", ["Câmera", "Upload"])
+    symbols = st.multiselect(
+        "Tipos de código:",
+        SIMBOLOGIAS,
+        default=SIMBOLOGIAS_PADRAO,
+        help="Ler só os tipos necessários deixa a leitura mais rápida; vazio procura todos"
+    )
     
     if source == "Câmera":
         img_file = st.camera_input("Capturar")
@@ -41,16 +80,20 @@ def main():
     
     if img_file:
         image = Image.open(img_file)
-        image_np = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         
-        results = read_codes(image_np)
-        marked_image = mark_image(image_np, results)
+        results = decode_image_bytes(img_file.getvalue(), tuple(symbols))
+        # As marcações são desenhadas direto no array RGB (o verde é o mesmo em
+        # RGB e BGR), sem ida e volta por BGR; sem códigos, nada é copiado
+        if results:
+            marked_image = mark_image(np.asarray(image.convert('RGB')), results)
+        else:
+            marked_image = image
         
         col1, col2 = st.columns(2)
         with col1:
             st.image(image, caption="Original")
         with col2:
-            st.image(cv2.cvtColor(marked_image, cv2.COLOR_BGR2RGB), caption="Detectado")
+            st.image(marked_image, caption="Detectado")
         
         if results:
             for r in results:
@@ -58,5 +101,9 @@ def main():
         else:
             st.warning("Nenhum código encontrado")
 
+def main():
+    st.title("Leitor QR Code/Código de Barras")
+    barcode_reader()
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -3,6 +3,21 @@ import pandas as pd
 import re
 from unidecode import unidecode
 from io import BytesIO
+from utils.excel import load_excel
+
+# Compilado uma vez; remove tudo que não é letra, número ou espaço
+PADRAO_CARACTERES_ESPECIAIS = re.compile(r'[^a-zA-Z0-9\s]')
+
+def limpar_palavra(palavra, cache):
+    """
+    Remove acentos e caracteres especiais de uma palavra já em minúsculas,
+    guardando o resultado em cache: o vocabulário se repete muito entre as
+    descrições e o unidecode roda uma só vez por palavra distinta
+    """
+    palavras = cache.get(palavra)
+    if palavras is None:
+        palavras = cache[palavra] = PADRAO_CARACTERES_ESPECIAIS.sub('', unidecode(palavra)).split()
+    return palavras
 
 def criar_tags(df, coluna_descricao, num_palavras):
     """
@@ -17,35 +32,26 @@ def criar_tags(df, coluna_descricao, num_palavras):
     Returns:
     pandas.DataFrame: DataFrame original com a nova coluna 'tags'
     """
-    def processar_texto(texto):
-        if pd.isna(texto):
-            return ''
-        
-        # Converter para minúsculas
-        texto = str(texto).lower()
-        
-        # Remover acentos
-        texto = unidecode(texto)
-        
-        # Remover caracteres especiais mantendo espaços
-        texto = re.sub(r'[^a-zA-Z0-9\s]', '', texto)
-        
-        # Remover espaços múltiplos
-        texto = ' '.join(texto.split())
-        
-        # Criar lista de palavras únicas com mais de 2 caracteres
-        palavras = [palavra for palavra in texto.split() if len(palavra) > 2]
-        palavras = sorted(set(palavras), key=lambda x: (-len(x), x))  # Ordena por tamanho (maior primeiro)
-        
-        # Limitar ao número de palavras especificado
-        palavras = palavras[:num_palavras]
-        
-        # Juntar palavras com espaço
-        return ' '.join(sorted(palavras))
+    # Minúsculas na coluna inteira; o restante da limpeza é feito uma vez por
+    # texto distinto e, dentro dele, uma vez por palavra distinta
+    textos = df[coluna_descricao]
+    textos = textos.where(textos.notna(), '').astype(str).str.lower()
+    codigos, textos_unicos = pd.factorize(textos)
+
+    def selecionar_palavras(palavras):
+        # Palavras únicas com mais de 2 caracteres, maiores primeiro
+        palavras = sorted({palavra for palavra in palavras if len(palavra) > 2}, key=lambda x: (-len(x), x))
+        # Limitar ao número de palavras especificado e juntar em ordem alfabética
+        return ' '.join(sorted(palavras[:num_palavras]))
 
     # Criar nova coluna de tags
     df_resultado = df.copy()
-    df_resultado['tags'] = df[coluna_descricao].apply(processar_texto)
+    cache = {}
+    tags_unicas = [
+        selecionar_palavras(palavra for token in texto.split() for palavra in limpar_palavra(token, cache))
+        for texto in textos_unicos
+    ]
+    df_resultado['tags'] = [tags_unicas[codigo] for codigo in codigos]
     
     return df_resultado
 
@@ -54,7 +60,7 @@ def to_excel(df):
     Converte o DataFrame para um arquivo Excel em memória
     """
     output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
         df.to_excel(writer, index=False)
     output.seek(0)
     return output
@@ -67,7 +73,7 @@ def main():
     
     if uploaded_file is not None:
         # Carregar o DataFrame
-        df = pd.read_excel(uploaded_file)
+        df = load_excel(uploaded_file.getvalue())
         
         # Mostrar preview dos dados
         st.subheader('Preview dos dados')
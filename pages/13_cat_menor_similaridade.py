@@ -1,7 +1,16 @@
 import streamlit as st
 import pandas as pd
 import io
+import os
+import ahocorasick
 from difflib import SequenceMatcher
+from joblib import Parallel, delayed
+from utils.excel import load_excel
+
+# Abaixo desse número de tags distintas, subir processos custa mais do que
+# o ganho de dividir a busca entre os núcleos
+PARALLEL_MIN_TAGS = 2000
+CHUNKS_PER_JOB = 4  # Blocos por processo, para equilibrar a carga entre eles
 
 def calculate_similarity(str1, str2):
     """
@@ -13,32 +22,79 @@ def calculate_similarity(str1, str2):
     str2 = str(str2).lower()
     return SequenceMatcher(None, str1, str2).ratio() * 100
 
-def find_best_match(row_tags, reference_tags):
+def prepare_reference_tags(reference_tags):
+    """
+    Pré-calcula, uma vez por tag de referência, o texto em minúsculas, o conjunto
+    de palavras e um SequenceMatcher com a tag já analisada como segunda sequência
+    """
+    prepared = []
+    for ref_tag in reference_tags:
+        ref_tag_str = str(ref_tag).lower()
+        matcher = SequenceMatcher(None)
+        matcher.set_seq2(ref_tag_str)  # O SequenceMatcher guarda a análise da segunda sequência
+        prepared.append((ref_tag, ref_tag_str, set(ref_tag_str.split()), matcher))
+    return prepared
+
+def build_tag_automaton(reference_tags):
+    """
+    Monta um autômato Aho-Corasick com as tags de referência já preparadas,
+    guardando a posição de cada uma para respeitar a ordem da lista
+    """
+    automaton = ahocorasick.Automaton()
+    empty_position = None
+    for position, (_, ref_tag_str, _, _) in enumerate(reference_tags):
+        if not ref_tag_str:
+            # A tag vazia está contida em qualquer texto; o autômato não a aceita
+            if empty_position is None:
+                empty_position = position
+        elif ref_tag_str not in automaton:
+            automaton.add_word(ref_tag_str, position)
+    if len(automaton):
+        automaton.make_automaton()
+    return automaton, empty_position
+
+def find_exact_match(row_tags, tag_automaton):
+    """
+    Retorna a posição da primeira tag de referência contida no texto,
+    percorrendo-o uma só vez (None se nenhuma estiver contida)
+    """
+    automaton, empty_position = tag_automaton
+    best_position = empty_position
+    if len(automaton):
+        for _, position in automaton.iter(row_tags):
+            if best_position is None or position < best_position:
+                best_position = position
+    return best_position
+
+def find_best_match(row_tags, reference_tags, tag_automaton):
     """
     Encontra a melhor correspondência entre as tags e retorna a tag e a similaridade
+    (reference_tags vem de prepare_reference_tags e tag_automaton de build_tag_automaton)
     """
     row_tags = str(row_tags).lower()
     best_match = None
     best_similarity = 0
     
     # Primeiro procura por matches exatos
-    for ref_tag in reference_tags:
-        ref_tag_str = str(ref_tag).lower()
-        if ref_tag_str in row_tags:
-            return ref_tag, 100.0
+    exact_position = find_exact_match(row_tags, tag_automaton)
+    if exact_position is not None:
+        return reference_tags[exact_position][0], 100.0
     
     # Se não encontrar match exato, procura pela maior similaridade
-    for ref_tag in reference_tags:
-        ref_tag_str = str(ref_tag).lower()
-        similarity = calculate_similarity(row_tags, ref_tag_str)
-        
+    row_words = set(row_tags.split())
+    for ref_tag, ref_tag_str, ref_words, matcher in reference_tags:
         # Também verifica se há palavras em comum
-        row_words = set(row_tags.split())
-        ref_words = set(ref_tag_str.split())
-        common_words = row_words.intersection(ref_words)
-        if common_words:
-            # Aumenta a similaridade se houver palavras em comum
-            similarity += len(common_words) * 10
+        # (aumenta a similaridade em 10 por palavra em comum)
+        bonus = len(row_words.intersection(ref_words)) * 10
+        
+        matcher.set_seq1(row_tags)
+        # real_quick_ratio e quick_ratio são limites superiores de ratio: se nem
+        # eles superam a melhor similaridade, o ratio completo não é calculado
+        if matcher.real_quick_ratio() * 100 + bonus <= best_similarity:
+            continue
+        if matcher.quick_ratio() * 100 + bonus <= best_similarity:
+            continue
+        similarity = matcher.ratio() * 100 + bonus
             
         if similarity > best_similarity:
             best_similarity = similarity
@@ -46,6 +102,40 @@ def find_best_match(row_tags, reference_tags):
             
     return best_match, min(best_similarity, 100.0)  # Limita a 100%
 
+def match_tags_chunk(tags, reference_tags):
+    """
+    Aplica find_best_match a um bloco de tags; cada processo prepara
+    sua própria cópia das tags de referência e do autômato
+    """
+    prepared = prepare_reference_tags(reference_tags)
+    tag_automaton = build_tag_automaton(prepared)
+    return [find_best_match(tag, prepared, tag_automaton) for tag in tags]
+
+def find_best_matches(tags, reference_tags, n_jobs=1):
+    """
+    Aplica find_best_match à coluna inteira, uma vez por valor distinto de tags;
+    com muitas tags distintas, a busca é dividida em blocos entre n_jobs processos
+    """
+    codes, uniques = pd.factorize(tags)
+    uniques = list(uniques)
+    if n_jobs > 1 and len(uniques) >= PARALLEL_MIN_TAGS:
+        chunk_size = -(-len(uniques) // (n_jobs * CHUNKS_PER_JOB))
+        chunks = Parallel(n_jobs=n_jobs)(
+            delayed(match_tags_chunk)(uniques[start:start + chunk_size], reference_tags)
+            for start in range(0, len(uniques), chunk_size)
+        )
+        results = [result for chunk in chunks for result in chunk]
+    else:
+        results = match_tags_chunk(uniques, reference_tags)
+    # Valores vazios (código -1) são calculados um a um: None vira "none" e NaN vira "nan"
+    missing = [tag for code, tag in zip(codes, tags) if code < 0]
+    missing = iter(match_tags_chunk(missing, reference_tags) if missing else [])
+    matches = [results[code] if code >= 0 else next(missing) for code in codes]
+    return (
+        pd.Series([match[0] for match in matches], index=tags.index),
+        pd.Series([match[1] for match in matches], index=tags.index)
+    )
+
 def main():
     st.title("Mesclador Inteligente de DataFrames por Tags")
     
@@ -62,10 +152,20 @@ def main():
         value=30
     )
     
+    # Número de processos usados na busca por similaridade; começa em 1
+    # (sequencial), e o paralelismo só é usado se o usuário aumentar o valor
+    cpu_count = os.cpu_count() or 1
+    n_jobs = st.sidebar.slider(
+        "Processos paralelos",
+        min_value=1,
+        max_value=max(cpu_count, 2),
+        value=1
+    )
+    
     if file1 is not None and file2 is not None:
         try:
-            df_nfs = pd.read_excel(file1)
-            df_categoria = pd.read_excel(file2)
+            df_nfs = load_excel(file1.getvalue())
+            df_categoria = load_excel(file2.getvalue())
             
             st.write("### Preview do DataFrame NFS")
             st.dataframe(df_nfs.head())
@@ -76,13 +176,10 @@ def main():
             reference_tags = df_categoria['tags'].unique()
             
             # Encontrando as melhores correspondências e similaridades
-            matches = df_nfs['tags'].apply(
-                lambda x: find_best_match(x, reference_tags)
+            df_nfs['matching_tag'], df_nfs['similarity'] = find_best_matches(
+                df_nfs['tags'], reference_tags, n_jobs
             )
             
-            df_nfs['matching_tag'] = matches.apply(lambda x: x[0])
-            df_nfs['similarity'] = matches.apply(lambda x: x[1])
-            
             # Filtrando por similaridade mínima
             df_nfs_matched = df_nfs[df_nfs['similarity'] >= min_similarity].copy()
             
@@ -122,7 +219,7 @@ def main():
             
             # Download do resultado
             buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
                 df_merged.to_excel(writer, index=False, sheet_name='Resultado')
             
             buffer.seek(0)
@@ -1,45 +1,106 @@
 import streamlit as st
 import pandas as pd
 import io
+import ahocorasick
+from utils.excel import load_excel
 
-def find_matching_words(nfs_tags, categoria_tags):
+def split_words(tags, cache):
+    """
+    Converte a tag para lowercase e quebra em palavras, guardando o resultado
+    em cache para que cada texto distinto seja processado uma só vez
+    """
+    texto = str(tags)
+    words = cache.get(texto)
+    if words is None:
+        words = cache[texto] = frozenset(texto.lower().split())
+    return words
+
+def find_matching_words(nfs_words, categoria_words):
     """
     Encontra e retorna as palavras que correspondem entre as tags,
     junto com a contagem e porcentagem
     """
-    try:
-        # Converte ambas as strings para lowercase e split em palavras
-        nfs_words = set(str(nfs_tags).lower().split())
-        categoria_words = set(str(categoria_tags).lower().split()) if pd.notna(categoria_tags) else set()
-        
-        # Palavras que aparecem em ambos os conjuntos
-        matching_words = nfs_words.intersection(categoria_words)
-        
-        # Criando string com palavras encontradas
-        matching_words_str = ", ".join(sorted(matching_words)) if matching_words else "Nenhuma"
-        
-        # Cálculos
-        matches = len(matching_words)
-        total_words_categoria = len(categoria_words)
-        percentage = (matches / total_words_categoria * 100) if total_words_categoria > 0 else 0
-        
-        return matching_words_str, matches, percentage
-    except:
-        return "Erro", 0, 0
+    # Palavras que aparecem em ambos os conjuntos
+    matching_words = nfs_words.intersection(categoria_words)
+    
+    # Criando string com palavras encontradas
+    matching_words_str = ", ".join(sorted(matching_words)) if matching_words else "Nenhuma"
+    
+    # Cálculos
+    matches = len(matching_words)
+    total_words_categoria = len(categoria_words)
+    percentage = (matches / total_words_categoria * 100) if total_words_categoria > 0 else 0
+    
+    return matching_words_str, matches, percentage
+
+def find_matching_words_columns(nfs_tags, categoria_tags):
+    """
+    Aplica find_matching_words às duas colunas de uma vez, sem apply por linha,
+    e devolve um DataFrame com as três colunas de estatísticas; as tags de
+    categoria se repetem e são quebradas em palavras uma só vez
+    """
+    cache = {}
+    results = [
+        find_matching_words(
+            split_words(nfs, cache),
+            split_words(categoria, cache) if pd.notna(categoria) else frozenset()
+        )
+        for nfs, categoria in zip(nfs_tags, categoria_tags)
+    ]
+    palavras, quantidades, porcentagens = zip(*results) if results else ((), (), ())
+    return pd.DataFrame({
+        'palavras_encontradas': pd.Series(palavras, dtype=object),
+        'qtd_palavras_encontradas': pd.Series(quantidades, dtype='int64'),
+        'porcentagem_palavras_categoria': pd.Series(porcentagens, dtype='float64')
+    }).set_axis(nfs_tags.index)
 
-def find_matching_tags(row_tags, reference_tags):
+def build_tag_automaton(reference_tags):
     """
-    Verifica se alguma tag de referência está contida no texto da coluna tags
+    Monta, uma única vez, um autômato Aho-Corasick com as tags de referência
+    em lowercase. Cada tag guarda sua posição na lista, para que a busca
+    devolva sempre a primeira referência encontrada, como na varredura linear
     """
-    try:
-        row_tags = str(row_tags).lower()  # Converte para string e lowercase
-        for ref_tag in reference_tags:
-            ref_tag = str(ref_tag).lower()  # Converte para string e lowercase
-            if ref_tag in row_tags:
-                return ref_tag
-        return None
-    except:
-        return None
+    automaton = ahocorasick.Automaton()
+    empty_position = None
+    for position, ref_tag in enumerate(reference_tags):
+        ref_tag = str(ref_tag).lower()
+        if not ref_tag:
+            # A tag vazia está contida em qualquer texto; o autômato não a aceita
+            if empty_position is None:
+                empty_position = position
+        elif ref_tag not in automaton:
+            automaton.add_word(ref_tag, (position, ref_tag))
+    if len(automaton):
+        automaton.make_automaton()
+    return automaton, empty_position
+
+def find_matching_tags(row_tags, tag_automaton):
+    """
+    Verifica se alguma tag de referência está contida no texto da coluna tags,
+    percorrendo o texto uma só vez
+    """
+    automaton, empty_position = tag_automaton
+    best = (empty_position, '') if empty_position is not None else None
+    if len(automaton):
+        for _, (position, ref_tag) in automaton.iter(str(row_tags).lower()):
+            if best is None or position < best[0]:
+                best = (position, ref_tag)
+    return best[1] if best else None
+
+def find_matching_tags_column(tags, reference_tags):
+    """
+    Aplica find_matching_tags a uma coluna inteira, buscando cada texto
+    distinto uma única vez
+    """
+    tag_automaton = build_tag_automaton(reference_tags)
+    cache = {}
+    matches = []
+    for row_tags in tags:
+        texto = str(row_tags)
+        if texto not in cache:
+            cache[texto] = find_matching_tags(texto, tag_automaton)
+        matches.append(cache[texto])
+    return pd.Series(matches, index=tags.index, dtype=object)
 
 def main():
     st.title("Mesclador de DataFrames por Tags")
@@ -55,8 +116,8 @@ def main():
     if file1 is not None and file2 is not None:
         try:
             # Lendo os arquivos Excel
-            df_nfs = pd.read_excel(file1)
-            df_categoria = pd.read_excel(file2)
+            df_nfs = load_excel(file1.getvalue())
+            df_categoria = load_excel(file2.getvalue())
             
             # Mostrando preview dos DataFrames originais
             st.write("### Preview do DataFrame NFS (tags_nfs.xlsx)")
@@ -69,8 +130,8 @@ def main():
             reference_tags = df_categoria['tags'].unique()
             
             # Encontrando correspondências
-            df_nfs['matching_tag'] = df_nfs['tags'].apply(
-                lambda x: find_matching_tags(x, reference_tags)
+            df_nfs['matching_tag'] = find_matching_tags_column(
+                df_nfs['tags'], reference_tags
             )
             
             # Realizando o merge mantendo todos os registros do df_nfs
@@ -84,18 +145,18 @@ def main():
             )
             
             # Calculando palavras correspondentes, quantidade e porcentagem
-            matches_data = df_merged.apply(
-                lambda row: find_matching_words(row['tags_nfs'], row['tags_categoria']),
-                axis=1
+            # (as três colunas saem de uma única passada pelas linhas)
+            stats = find_matching_words_columns(
+                df_merged['tags_nfs'], df_merged['tags_categoria']
             )
+            porcentagens = stats['porcentagem_palavras_categoria'].round(2)
             
-            # Adicionando novas colunas
-            df_merged['palavras_encontradas'] = matches_data.apply(lambda x: x[0])
-            df_merged['qtd_palavras_encontradas'] = matches_data.apply(lambda x: x[1])
-            df_merged['porcentagem_palavras_categoria'] = matches_data.apply(lambda x: x[2]).round(2)
-            
-            # Formatando a porcentagem para exibição
-            df_merged['porcentagem_palavras_categoria'] = df_merged['porcentagem_palavras_categoria'].astype(str) + '%'
+            # Adicionando novas colunas, com a porcentagem formatada para exibição
+            df_merged = df_merged.assign(
+                palavras_encontradas=stats['palavras_encontradas'],
+                qtd_palavras_encontradas=stats['qtd_palavras_encontradas'],
+                porcentagem_palavras_categoria=porcentagens.astype(str) + '%'
+            )
             
             # Removendo a coluna auxiliar
             df_merged = df_merged.drop('matching_tag', axis=1)
@@ -108,7 +169,7 @@ def main():
             # Mostrando resultado
             st.write("### DataFrame Mesclado")
             st.write(f"Total de registros: {len(df_merged)}")
-            st.write(f"Registros com correspondência: {len(df_merged[df_merged['qtd_palavras_encontradas'] > 0])}")
+            st.write(f"Registros com correspondência: {(df_merged['qtd_palavras_encontradas'] > 0).sum()}")
             
             # Explicação das novas colunas
             st.write("""
@@ -123,7 +184,8 @@ def main():
             # Estatísticas gerais
             st.write("### Estatísticas Gerais")
             media_palavras = df_merged['qtd_palavras_encontradas'].mean()
-            media_porcentagem = df_merged['porcentagem_palavras_categoria'].str.rstrip('%').astype(float).mean()
+            # Média calculada sobre os valores numéricos, sem reconverter o texto com '%'
+            media_porcentagem = porcentagens.mean()
             
             col1, col2 = st.columns(2)
             with col1:
@@ -133,7 +195,7 @@ def main():
             
             # Botão para download do resultado em Excel
             buffer = io.BytesIO()
-            with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+            with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
                 df_merged.to_excel(writer, index=False, sheet_name='Resultado')
             
             buffer.seek(0)
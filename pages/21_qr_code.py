@@ -1,31 +1,121 @@
 import streamlit as st
+import io
 from PIL import Image
 import numpy as np
 import cv2
-from pyzbar.pyzbar import decode
+import threading
+from pyzbar.pyzbar import decode, ZBarSymbol
 
-def read_codes(img):
+MAX_DECODE_SIDE = 1600  # Lado maior (px) usado na primeira tentativa de leitura
+
+# Simbologias oferecidas na tela; o zbar só roda os leitores das selecionadas
+SIMBOLOGIAS = ['QRCODE', 'EAN13', 'EAN8', 'UPCA', 'UPCE', 'CODE128', 'CODE39', 'CODE93', 'I25', 'CODABAR']
+SIMBOLOGIAS_PADRAO = ['QRCODE', 'EAN13', 'CODE128']
+
+# Códigos de barras que o detector nativo do OpenCV lê, com o nome usado pelo pyzbar;
+# QR Code fica com o QRCodeDetectorAruco e o restante continua no pyzbar
+OPENCV_BARCODE_TYPES = {'EAN_13': 'EAN13', 'EAN_8': 'EAN8', 'UPC_A': 'UPCA', 'UPC_E': 'UPCE'}
+OPENCV_SYMBOLS = {'QRCODE', *OPENCV_BARCODE_TYPES.values()}
+
+# Um UPC-A é um EAN-13 com zero à esquerda: os dois leitores podem relatar o
+# mesmo código com tipos diferentes, então a comparação usa 13 dígitos
+EAN13_FAMILY = {'EAN13', 'UPCA'}
+
+# Detectores criados uma vez por thread do Streamlit e reaproveitados nas
+# leituras seguintes (a mesma instância não é usada por duas threads ao mesmo tempo)
+_detectors = threading.local()
+
+def get_detectors():
+    if not hasattr(_detectors, 'qr'):
+        _detectors.qr = cv2.QRCodeDetectorAruco()
+        _detectors.bc = cv2.barcode.BarcodeDetector()
+    return _detectors.qr, _detectors.bc
+
+def polygon_points(points):
+    return [(int(x), int(y)) for x, y in points]
+
+def read_opencv_codes(gray, symbols):
+    # O retorno booleano dos detectores não é usado: ele fica False se algum
+    # código detectado não foi decodificado, mesmo havendo outros lidos
+    qr_detector, barcode_detector = get_detectors()
+    results = []
+    if 'QRCODE' in symbols:
+        _, datas, points, _ = qr_detector.detectAndDecodeMulti(gray)
+        for data, pts in zip(datas, points if points is not None else []):
+            if data:  # Detectado mas não decodificado vem vazio
+                results.append({'type': 'QRCODE', 'data': data, 'points': polygon_points(pts)})
+    if symbols & set(OPENCV_BARCODE_TYPES.values()):
+        _, datas, types, points = barcode_detector.detectAndDecodeWithType(gray)
+        for data, code_type, pts in zip(datas, types, points if points is not None else []):
+            code_type = OPENCV_BARCODE_TYPES.get(code_type)
+            if data and code_type in symbols:
+                results.append({'type': code_type, 'data': data, 'points': polygon_points(pts)})
+    return results
+
+def read_zbar_codes(img, symbols):
+    return [
+        {'type': code.type, 'data': code.data.decode('utf-8'), 'points': code.polygon}
+        for code in decode(img, symbols=[ZBarSymbol[name] for name in SIMBOLOGIAS if name in symbols])
+    ]
+
+def unique_codes(results):
+    seen = set()
+    unique = []
+    for result in results:
+        key = result['data'].zfill(13) if result['type'] in EAN13_FAMILY else result['data']
+        if key not in seen:
+            seen.add(key)
+            unique.append(result)
+    return unique
+
+def read_codes(img, symbols=None):
     try:
-        codes = decode(img)
-        results = []
-        for code in codes:
-            results.append({
-                'type': code.type,
-                'data': code.data.decode('utf-8'),
-                'points': code.polygon
-            })
-        return results
+        # Sem simbologias selecionadas, procura todas
+        symbols = set(symbols or SIMBOLOGIAS)
+        # Se alguma simbologia só existe no zbar, a passada dele é inevitável e
+        # já cobre as demais: uma única leitura, sem somar as do OpenCV
+        if not symbols <= OPENCV_SYMBOLS:
+            return read_zbar_codes(img, symbols)
+        # Só simbologias do OpenCV: o pyzbar roda apenas para as que o OpenCV
+        # não encontrou (o zbar é mais tolerante com fotos ruins)
+        results = read_opencv_codes(img, symbols)
+        missing = symbols - {result['type'] for result in results}
+        if missing:
+            results += read_zbar_codes(img, missing)
+        return unique_codes(results)
     except Exception as e:
         st.error(f"Erro na leitura: {e}")
         return []
 
+# Mesmo conteúdo de imagem nos reruns não passa de novo pelos detectores
+@st.cache_data(show_spinner=False, max_entries=8)
+def decode_image_bytes(img_bytes, symbols=None):
+    # Conversão direta para tons de cinza no PIL, sem a cópia BGR intermediária
+    gray = np.asarray(Image.open(io.BytesIO(img_bytes)).convert('L'))
+    
+    # Fotos da câmera do celular chegam a 4000x3000: a primeira leitura é feita
+    # numa cópia reduzida, com os polígonos levados de volta à escala original
+    height, width = gray.shape
+    scale = MAX_DECODE_SIDE / max(height, width)
+    if scale < 1:
+        small = cv2.resize(gray, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        results = read_codes(small, symbols)
+        if results:
+            for result in results:
+                result['points'] = [(round(x / scale), round(y / scale)) for x, y in result['points']]
+            return results
+    
+    # Imagem pequena, ou nada encontrado na versão reduzida: lê em resolução total
+    return read_codes(gray, symbols)
+
 def mark_image(img, results):
     output = img.copy()
-    for result in results:
-        pts = np.array(result['points']).reshape((-1, 1, 2))
-        cv2.polylines(output, [pts], True, (0, 255, 0), 2)
+    # Todos os contornos num único polylines; só o texto precisa de uma chamada por código
+    all_pts = [np.asarray(result['points'], dtype=np.int32).reshape((-1, 1, 2)) for result in results]
+    cv2.polylines(output, all_pts, True, (0, 255, 0), 2)
+    for result, pts in zip(results, all_pts):
         x, y = pts[0][0]
-        cv2.putText(output, result['type'], (x, y-10),
+        cv2.putText(output, result['type'], (int(x), int(y) - 10),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
     return output
 
@@ -33,6 +123,12 @@ def main():
     st.title("Leitor QR Code/Código de Barras")
     
     source = st.radio("Selecione a fonte:", ["Câmera", "Upload"])
+    symbols = st.multiselect(
+        "Tipos de código:",
+        SIMBOLOGIAS,
+        default=SIMBOLOGIAS_PADRAO,
+        help="Ler só os tipos necessários deixa a leitura mais rápida; vazio procura todos"
+    )
     
     if source == "Câmera":
         img_file = st.camera_input("Capturar")
@@ -41,16 +137,20 @@ def main():
     
     if img_file:
         image = Image.open(img_file)
-        image_np = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
         
-        results = read_codes(image_np)
-        marked_image = mark_image(image_np, results)
+        results = decode_image_bytes(img_file.getvalue(), tuple(symbols))
+        # As marcações são desenhadas direto no array RGB (o verde é o mesmo em
+        # RGB e BGR), sem ida e volta por BGR; sem códigos, nada é copiado
+        if results:
+            marked_image = mark_image(np.asarray(image.convert('RGB')), results)
+        else:
+            marked_image = image
         
         col1, col2 = st.columns(2)
         with col1:
             st.image(image, caption="Original")
         with col2:
-            st.image(cv2.cvtColor(marked_image, cv2.COLOR_BGR2RGB), caption="Detectado")
+            st.image(marked_image, caption="Detectado")
         
         if results:
             for r in results:
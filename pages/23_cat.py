@@ -63,60 +63,78 @@ def carregar_colecao_mongodb(
         st.error(f"Erro ao carregar a coleção {nome_colecao}: {e}")
         return pl.DataFrame()
 
-def calcular_similaridade_tags(df_xml: pd.DataFrame, df_cat: pd.DataFrame) -> pd.DataFrame:
+def calcular_similaridade_tags(df_xml: pl.LazyFrame, df_cat: pl.LazyFrame) -> pl.LazyFrame:
     """
     Calcula similaridade de tags para preencher dados ausentes.
     
     Args:
-        df_xml (pd.DataFrame): DataFrame de XML
-        df_cat (pd.DataFrame): DataFrame de categorias
+        df_xml (pl.LazyFrame): LazyFrame de XML
+        df_cat (pl.LazyFrame): LazyFrame de categorias
     
     Returns:
-        pd.DataFrame: DataFrame com dados preenchidos
+        pl.LazyFrame: LazyFrame com dados preenchidos
     """
     # Verificar se as colunas existem, se não existirem, criar colunas vazias
     colunas_necessarias = ['grupo', 'subgrupo']
-    for coluna in colunas_necessarias:
-        if coluna not in df_xml.columns:
-            df_xml[coluna] = pd.NA
-        if coluna not in df_cat.columns:
-            df_cat[coluna] = pd.NA
-
-    # Pré-processar tags
-    df_xml['tags_processadas'] = df_xml['tags'].fillna('').str.lower()
-    df_cat['tags_processadas'] = df_cat['tags'].fillna('').str.lower()
-    
-    # Dividir tags em conjuntos de palavras
-    df_xml['palavras_tags'] = df_xml['tags_processadas'].str.split()
-    df_cat['palavras_tags'] = df_cat['tags_processadas'].str.split()
-    
-    df_mesclado = df_xml.copy()
+    colunas_xml = df_xml.collect_schema().names()
+    colunas_cat = df_cat.collect_schema().names()
+    df_xml = df_xml.with_columns(
+        pl.lit(None, dtype=pl.String).alias(coluna) for coluna in colunas_necessarias if coluna not in colunas_xml
+    )
+    df_cat = df_cat.with_columns(
+        pl.lit(None, dtype=pl.String).alias(coluna) for coluna in colunas_necessarias if coluna not in colunas_cat
+    )
+
+    # Pré-processar tags: minúsculas e palavras separadas por espaços, uma
+    # linha por (posição, palavra) sem palavras repetidas na mesma linha
+    def palavras_por_posicao(df: pl.LazyFrame, posicao: str) -> pl.LazyFrame:
+        return (
+            df.select(
+                pl.col(posicao),
+                pl.col('tags').fill_null('').str.to_lowercase().str.extract_all(r'\S+').alias('palavra')
+            )
+            .explode('palavra')
+            .drop_nulls('palavra')
+            .unique()
+        )
+
+    df_xml = df_xml.with_row_index('pos_xml')
+    df_cat = df_cat.with_row_index('pos_cat')
     
-    # Máscara para linhas com grupo ou subgrupo ausentes
-    mascara_ausente = df_mesclado['grupo'].isna() | df_mesclado['subgrupo'].isna()
+    # Linhas com grupo ou subgrupo ausentes
+    ausentes = df_xml.filter(pl.col('grupo').is_null() | pl.col('subgrupo').is_null())
     
-    for idx in df_mesclado.index[mascara_ausente]:
-        tags_linha = set(df_mesclado.loc[idx, 'palavras_tags'])
-        
-        # Computar similaridades
-        similaridades = df_cat['palavras_tags'].apply(lambda x: len(set(x).intersection(tags_linha)))
-        
-        # Encontrar a melhor correspondência
-        if not similaridades.empty:
-            idx_melhor_correspondencia = similaridades.idxmax()
-            melhor_correspondencia = df_cat.loc[idx_melhor_correspondencia]
-            
-            # Atualizar valores ausentes
-            if pd.isna(df_mesclado.loc[idx, 'grupo']) and not pd.isna(melhor_correspondencia['grupo']):
-                df_mesclado.loc[idx, 'grupo'] = melhor_correspondencia['grupo']
-            
-            if pd.isna(df_mesclado.loc[idx, 'subgrupo']) and not pd.isna(melhor_correspondencia['subgrupo']):
-                df_mesclado.loc[idx, 'subgrupo'] = melhor_correspondencia['subgrupo']
+    # Índice invertido: o join pela palavra gera os pares com palavras em comum
+    # e o group_by conta quantas são; fica a melhor categoria de cada linha,
+    # a primeira no empate
+    melhores = (
+        palavras_por_posicao(ausentes, 'pos_xml')
+        .join(palavras_por_posicao(df_cat, 'pos_cat'), on='palavra')
+        .group_by('pos_xml', 'pos_cat')
+        .len('similaridade')
+        .sort(['pos_xml', 'similaridade', 'pos_cat'], descending=[False, True, False])
+        .unique('pos_xml', keep='first')
+    )
     
-    # Limpar colunas temporárias
-    df_mesclado.drop(columns=['tags_processadas', 'palavras_tags'], inplace=True)
+    # Sem nenhuma palavra em comum vale a primeira categoria (como o idxmax de antes)
+    melhores = (
+        ausentes.select('pos_xml')
+        .join(melhores, on='pos_xml', how='left')
+        .select('pos_xml', pl.col('pos_cat').fill_null(0))
+        .join(
+            df_cat.select('pos_cat', *[pl.col(c).alias(f'{c}_melhor') for c in colunas_necessarias]),
+            on='pos_cat',
+            how='left'
+        )
+    )
     
-    return df_mesclado
+    # Atualizar valores ausentes com os da melhor correspondência
+    return (
+        df_xml.join(melhores.drop('pos_cat'), on='pos_xml', how='left')
+        .sort('pos_xml')
+        .with_columns(pl.coalesce(c, f'{c}_melhor').alias(c) for c in colunas_necessarias)
+        .drop('pos_xml', *[f'{c}_melhor' for c in colunas_necessarias])
+    )
 
 def main():
     # Configuração da página
@@ -171,40 +189,60 @@ def main():
                 URI_MONGODB, nome_bd, 'xml', colunas_selecionadas + colunas_opcionais
             )
 
-            # Converter para Pandas
-            pandas_cat = polars_cat.to_pandas() if not polars_cat.is_empty() else pd.DataFrame()
-            pandas_xml = polars_xml.to_pandas() if not polars_xml.is_empty() else pd.DataFrame()
-
             # Verificar se há dados
-            if pandas_cat.empty or pandas_xml.empty:
+            if polars_cat.is_empty() or polars_xml.is_empty():
                 st.warning("Não foi possível carregar os dados.")
                 st.stop()
 
-            # Mesclar DataFrames
-            df_mesclado = pd.merge(
-                pandas_xml, 
-                pandas_cat, 
-                on="tags", 
-                how="left",
-                suffixes=('_xml', '_cat')
+            # Coleção sem tags, ou só com tags nulas, gera a coluna com tipo Null (ou
+            # nem gera): as duas passam a ter tags como texto, para o join e o
+            # pré-processamento das palavras
+            polars_xml, polars_cat = (
+                df.with_columns(
+                    pl.col('tags').cast(pl.String) if 'tags' in df.columns
+                    else pl.lit(None, dtype=pl.String).alias('tags')
+                )
+                for df in (polars_xml, polars_cat)
             )
 
-            # Adicionar colunas em falta com valores NA se não existirem
-            for coluna in ['grupo', 'subgrupo', 'unique']:
-                if coluna not in df_mesclado.columns:
-                    df_mesclado[coluna] = pd.NA
+            # Todo o processamento é montado em modo lazy e executado pelo Polars
+            # de uma vez no collect(), sem passar os dados pelo pandas
+            lazy_xml = polars_xml.lazy()
+            lazy_cat = polars_cat.lazy()
+
+            # Mesclar DataFrames (colunas em comum recebem os sufixos _xml e _cat;
+            # tags vazias também se correspondem, como no merge do pandas)
+            colunas_comuns = [
+                coluna for coluna in polars_xml.columns
+                if coluna in polars_cat.columns and coluna != 'tags'
+            ]
+            df_mesclado = lazy_xml.rename(
+                {coluna: f'{coluna}_xml' for coluna in colunas_comuns}
+            ).join(
+                lazy_cat.rename({coluna: f'{coluna}_cat' for coluna in colunas_comuns}),
+                on='tags',
+                how='left',
+                join_nulls=True
+            )
+
+            # Adicionar colunas em falta com valores nulos se não existirem
+            colunas_mescladas = df_mesclado.collect_schema().names()
+            df_mesclado = df_mesclado.with_columns(
+                pl.lit(None, dtype=pl.String).alias(coluna)
+                for coluna in ['grupo', 'subgrupo', 'unique'] if coluna not in colunas_mescladas
+            )
 
             # Preencher dados ausentes
-            df_mesclado = calcular_similaridade_tags(df_mesclado, pandas_cat)
+            df_mesclado = calcular_similaridade_tags(df_mesclado, lazy_cat)
 
-            # Remover duplicatas
-            if 'unique' in df_mesclado.columns:
-                df_mesclado.drop_duplicates(subset='unique', inplace=True)
-            df_mesclado.drop_duplicates(subset='tags', inplace=True)
-            
-            # Remover coluna 'unique' se existir
-            if 'unique' in df_mesclado.columns:
-                df_mesclado.drop(columns='unique', errors='ignore', inplace=True)
+            # Remover duplicatas e a coluna 'unique'
+            df_mesclado = (
+                df_mesclado
+                .unique('unique', keep='first', maintain_order=True)
+                .unique('tags', keep='first', maintain_order=True)
+                .drop('unique')
+                .collect()
+            )
 
             # Exibir resultados
             st.success(f"✅ Dados processados com sucesso! Total de registros: {len(df_mesclado)}")
@@ -212,10 +250,10 @@ def main():
             # Visualização dos dados
             st.dataframe(df_mesclado)
 
-            # Botão de download
+            # Botão de download (o pandas só entra aqui, para gerar a planilha)
             buffer = io.BytesIO()
             with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                df_mesclado.to_excel(writer, index=False, sheet_name='Dados')
+                df_mesclado.to_pandas().to_excel(writer, index=False, sheet_name='Dados')
             
             st.download_button(
                 label="📥 Baixar Dados em Excel",
@@ -1,11 +1,13 @@
 import streamlit as st
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from bs4 import BeautifulSoup
 import io
 import urllib.parse
 import random
+from itertools import islice
+from utils.bing import extrair_src_imagens
 
 class RapidBingImageScraper:
     def __init__(self, max_workers=10):
@@ -20,6 +22,14 @@ class RapidBingImageScraper:
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
             "Accept-Language": "pt-BR,pt;q=0.9,en-US;q=0.8,en;q=0.7"
         }
+        
+        # Sessão compartilhada pelas threads: as conexões com o Bing ficam abertas
+        # (keep-alive) e cada busca reaproveita uma delas, sem novo handshake TLS
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
     def _buscar_imagens_bing_rapido(self, query, num_imagens=3):
         """
@@ -38,18 +48,11 @@ class RapidBingImageScraper:
             url = f"https://www.bing.com/images/search?q={query_encoded}"
             
             # Requisição única
-            response = requests.get(url, headers=self.headers, timeout=5)
-            
-            # Parsing rápido
-            soup = BeautifulSoup(response.text, 'lxml')
-            
-            # Encontrar imagens de forma mais eficiente
-            imagens = soup.select('img.mimg')
+            response = self.session.get(url, timeout=5)
             
             # Extrair URLs rapidamente
             urls_imagens = []
-            for img in imagens[:num_imagens]:
-                src = img.get('src') or img.get('data-src', '')
+            for src in islice(extrair_src_imagens(response.text), num_imagens):
                 if src and (src.startswith('http') or src.startswith('/th?')):
                     urls_imagens.append(f"https://www.bing.com{src}" if src.startswith('/th?') else src)
             
@@ -75,6 +78,10 @@ class RapidBingImageScraper:
         if 'url_imagens' not in df.columns:
             df['url_imagens'] = ''
         
+        # Resultados guardados numa lista por posição e gravados no DataFrame de
+        # uma vez no final, em vez de uma escrita .at por linha
+        resultados = df['url_imagens'].tolist()
+        
         # Barra de progresso
         progresso = st.progress(0)
         
@@ -91,20 +98,24 @@ class RapidBingImageScraper:
             }
             
             # Processar resultados conforme completam
-            for future in as_completed(futures):
+            for concluidos, future in enumerate(as_completed(futures), start=1):
                 indice = futures[future]
                 try:
                     urls_imagens = future.result()
                     if urls_imagens:
-                        df.at[indice, 'url_imagens'] = '; '.join(urls_imagens)
+                        resultados[indice] = '; '.join(urls_imagens)
                     
-                    # Atualizar progresso
-                    progresso.progress((indice + 1) / len(df))
+                    # Atualizar progresso (as buscas terminam fora de ordem)
+                    progresso.progress(concluidos / len(df))
                 
                 except Exception as e:
                     st.warning(f"Erro ao processar índice {indice}: {e}")
         
+        df['url_imagens'] = resultados
         progresso.empty()
+        
+        # Libera as conexões que a sessão manteve abertas
+        self.session.close()
         return df
 
 def main():
@@ -156,7 +167,11 @@ def main():
                 
                 # Preparar download
                 output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                with pd.ExcelWriter(
+                    output,
+                    engine='xlsxwriter',
+                    engine_kwargs={'options': {'strings_to_urls': False}}  # URLs ficam como texto, igual ao openpyxl
+                ) as writer:
                     df_imagens.to_excel(writer, index=False)
                 
                 output.seek(0)
@@ -1,11 +1,11 @@
 import streamlit as st
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 import urllib.parse
 import time
 import random
 import io
+from utils.bing import atributos_imagens_bing
 
 
 
@@ -20,10 +20,9 @@ def buscar_imagem_bing(query):
             "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
         }
         response = requests.get(url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        imagens = soup.find_all('img', class_='mimg')
-        if imagens:
-            return imagens[0].get('src', '')
+        # Primeira imagem com a classe mimg (miniaturas do Bing)
+        for atributos in atributos_imagens_bing(response.text):
+            return atributos.get('src', '')
         return ""
     except Exception as e:
         st.warning(f"Erro na busca de imagem no Bing: {e}")
@@ -87,7 +86,11 @@ def main():
                 st.dataframe(df_com_imagens)
                 
                 output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                with pd.ExcelWriter(
+                    output,
+                    engine='xlsxwriter',
+                    engine_kwargs={'options': {'strings_to_urls': False}}
+                ) as writer:
                     df_com_imagens.to_excel(writer, index=False, sheet_name='Imagens')
                 output.seek(0)
                 
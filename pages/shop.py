@@ -117,7 +117,11 @@ def main():
                 
                 # Preparar download
                 output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                with pd.ExcelWriter(
+                    output,
+                    engine='xlsxwriter',
+                    engine_kwargs={'options': {'strings_to_urls': False}}
+                ) as writer:
                     df_com_links.to_excel(writer, index=False, sheet_name='Links')
                 output.seek(0)
                 
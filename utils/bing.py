@@ -0,0 +1,27 @@
+import html
+import re
+
+# Tags <img> (aspas podem conter '>') e seus atributos; ler o HTML com regex
+# evita montar a árvore DOM da página inteira só para achar as miniaturas
+PADRAO_TAG_IMG = re.compile(r'<img\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>', re.IGNORECASE)
+PADRAO_ATRIBUTO = re.compile(r'([\w-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+def atributos_imagens_bing(pagina_html):
+    """
+    Percorre as tags img.mimg (miniaturas do Bing) da página e devolve os
+    atributos de cada uma, com nomes em minúsculas e entidades HTML decodificadas
+    """
+    for tag in PADRAO_TAG_IMG.finditer(pagina_html):
+        atributos = {
+            nome.lower(): html.unescape(aspas_duplas or aspas_simples)
+            for nome, aspas_duplas, aspas_simples in PADRAO_ATRIBUTO.findall(tag.group(0))
+        }
+        if 'mimg' in atributos.get('class', '').split():
+            yield atributos
+
+def extrair_src_imagens(pagina_html):
+    """
+    Devolve, para cada miniatura do Bing, o src (ou o data-src, se não houver src)
+    """
+    for atributos in atributos_imagens_bing(pagina_html):
+        yield atributos.get('src') or atributos.get('data-src', '')
@@ -0,0 +1,13 @@
+import io
+
+import pandas as pd
+import streamlit as st
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def load_excel(file_bytes):
+    """Lê o Excel enviado; o cache é indexado pelo conteúdo do arquivo"""
+    try:
+        # calamine (Rust) é bem mais rápido que o openpyxl
+        return pd.read_excel(io.BytesIO(file_bytes), engine='calamine')
+    except ImportError:
+        return pd.read_excel(io.BytesIO(file_bytes))
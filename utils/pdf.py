@@ -0,0 +1,25 @@
+import hashlib
+
+import fitz  # PyMuPDF
+import streamlit as st
+from PIL import Image
+
+# Mantém o PDF aberto na sessão enquanto o mesmo arquivo estiver carregado.
+# Cada página passa o próprio prefixo, para uma não fechar o documento da outra
+def open_pdf_document(pdf_bytes, key_prefix):
+    document_key = f"{key_prefix}_pdf_document"
+    hash_key = f"{key_prefix}_pdf_hash"
+    pdf_hash = hashlib.sha1(pdf_bytes).hexdigest()
+    if st.session_state.get(hash_key) != pdf_hash:
+        if document_key in st.session_state:
+            st.session_state[document_key].close()
+        st.session_state[document_key] = fitz.open(stream=pdf_bytes, filetype="pdf")
+        st.session_state[hash_key] = pdf_hash
+    return st.session_state[document_key], pdf_hash
+
+# Rasteriza apenas a página pedida; o cache evita refazer o trabalho em reruns
+@st.cache_data(show_spinner=False, max_entries=32)
+def render_pdf_page(pdf_hash, page_index, _pdf_document):
+    page = _pdf_document.load_page(page_index)
+    pixmap = page.get_pixmap()  # 72 DPI: 1 pixel = 1 ponto do PDF, usado nas coordenadas da assinatura
+    return Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)